@@ -1,10 +1,20 @@
 from django.urls import path
 
+from posts.pagecache import cached_page, no_scopes
+
 from . import views
 
 app_name = 'about'
 
 urlpatterns = [
-    path('author/', views.AboutAuthorView.as_view(), name='author'),
-    path('tech/', views.AboutTechView.as_view(), name='tech'),
+    path(
+        'author/',
+        cached_page(no_scopes)(views.AboutAuthorView.as_view()),
+        name='author'
+    ),
+    path(
+        'tech/',
+        cached_page(no_scopes)(views.AboutTechView.as_view()),
+        name='tech'
+    ),
 ]
@@ -6,6 +6,8 @@ import sys
 
 def main():
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    if sys.argv[1:2] == ['test']:
+        os.environ.setdefault('SETTINGS_PROFILE', 'test')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -0,0 +1,234 @@
+"""JSON API для лент и страницы поста.
+
+Ленты и комментарии листаются только курсором (?cursor=), как и
+HTML-ленты; страница поста отдаёт первую страницу комментариев и
+ссылку comments_next на следующую.
+У каждого ответа есть ETag и Last-Modified, посчитанные по
+выбранным постам: если клиент прислал совпадающий If-None-Match
+или If-Modified-Since, сериализация пропускается и отдаётся 304.
+"""
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_safe
+
+from .conditional import conditional, make_etag
+from .feeds import TimelinePaginator
+from .models import Group, Post
+from .paginators import CursorPaginator, InvalidCursor
+from .utils import POSTS_PER_PAGE, comments_paginator
+
+User = get_user_model()
+
+JSON_PARAMS = {'ensure_ascii': False}
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def error_response(message, status):
+    return json_response({'error': message}, status=status)
+
+
+def serialize_user(user):
+    return {
+        'username': user.username,
+        'full_name': user.get_full_name(),
+    }
+
+
+def serialize_post(request, post):
+    return {
+        'id': post.id,
+        'text': post.text,
+        'author': serialize_user(post.author),
+        'group': post.group and {
+            'slug': post.group.slug,
+            'title': post.group.title,
+        },
+        'pub_date': post.pub_date,
+        'updated': post.updated,
+        'image': (
+            request.build_absolute_uri(post.image.url) if post.image else None
+        ),
+        'comments_count': post.comments_count,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.id,
+        'text': comment.text,
+        'author': serialize_user(comment.author),
+        'created': comment.created,
+    }
+
+
+def post_version(post):
+    # Всё, что попадает в serialize_post и может поменяться.
+    return (
+        post.id,
+        post.updated,
+        post.comments_count,
+        post.author.username,
+        post.author.first_name,
+        post.author.last_name,
+        post.group and (post.group.slug, post.group.title),
+    )
+
+
+def comment_version(comment):
+    return (
+        comment.id,
+        comment.text,
+        comment.author.username,
+        comment.author.first_name,
+        comment.author.last_name,
+    )
+
+
+def cursor_url(request, cursor):
+    if cursor is None:
+        return None
+    return request.build_absolute_uri(f'{request.path}?cursor={cursor}')
+
+
+def feed_response(request, paginator, **extra):
+    """Страница ленты по ?cursor= с условным ответом.
+
+    extra — дополнительные поля ответа; они тоже входят в ETag.
+    """
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return error_response('Некорректный курсор.', 400)
+    posts = list(page)
+    etag = make_etag(
+        [post_version(post) for post in posts],
+        page.has_next(),
+        page.has_previous(),
+        sorted(extra.items()),
+    )
+    last_modified = max(
+        (max(post.pub_date, post.updated) for post in posts), default=None
+    )
+
+    def build():
+        return json_response(dict(
+            extra,
+            results=[serialize_post(request, post) for post in posts],
+            next=cursor_url(request, page.next_cursor()),
+            previous=cursor_url(request, page.previous_cursor()),
+        ))
+    return conditional(request, etag, last_modified, build)
+
+
+@require_safe
+def index(request):
+    return feed_response(
+        request, CursorPaginator(Post.objects.for_feed(), POSTS_PER_PAGE)
+    )
+
+
+@require_safe
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(
+        request,
+        CursorPaginator(group.posts.for_feed(), POSTS_PER_PAGE),
+        group={
+            'slug': group.slug,
+            'title': group.title,
+            'description': group.description,
+        }
+    )
+
+
+@require_safe
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    return feed_response(
+        request,
+        CursorPaginator(author.posts.for_feed(), POSTS_PER_PAGE),
+        author=dict(
+            serialize_user(author),
+            posts_count=author.stats.posts_count,
+            followers_count=author.stats.followers_count,
+            following_count=author.stats.following_count,
+        )
+    )
+
+
+@require_safe
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error_response('Требуется авторизация.', 401)
+    response = feed_response(
+        request,
+        TimelinePaginator(request.user, POSTS_PER_PAGE),
+        user=request.user.username
+    )
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+@require_safe
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), id=post_id)
+    # Число комментариев уже есть в post_version (счётчик поста), а
+    # время последнего — одна строка по индексу (post, created), без
+    # перебора всех комментариев популярного поста. Сами комментарии
+    # читаются только для полного ответа.
+    newest = post.comments.order_by('-created').values_list(
+        'created', flat=True
+    ).first()
+    etag = make_etag(post_version(post), newest)
+    last_modified = max(
+        filter(None, (post.pub_date, post.updated, newest))
+    )
+
+    def build():
+        page = comments_paginator(post).page()
+        next_url = None
+        if page.has_next():
+            next_url = request.build_absolute_uri(
+                reverse('posts:api_comments', args=[post.id])
+                + f'?cursor={page.next_cursor()}'
+            )
+        return json_response({
+            'post': serialize_post(request, post),
+            'comments': [serialize_comment(comment) for comment in page],
+            'comments_next': next_url,
+        })
+    return conditional(request, etag, last_modified, build)
+
+
+@require_safe
+def post_comments(request, post_id):
+    post = get_object_or_404(Post, id=post_id)
+    try:
+        page = comments_paginator(post).page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return error_response('Некорректный курсор.', 400)
+    comments = list(page)
+    etag = make_etag(
+        [comment_version(comment) for comment in comments],
+        page.has_next(),
+        page.has_previous(),
+    )
+    last_modified = max(
+        (comment.created for comment in comments), default=None
+    )
+
+    def build():
+        return json_response({
+            'results': [serialize_comment(comment) for comment in comments],
+            'next': cursor_url(request, page.next_cursor()),
+            'previous': cursor_url(request, page.previous_cursor()),
+        })
+    return conditional(request, etag, last_modified, build)
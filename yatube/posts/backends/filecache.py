@@ -0,0 +1,95 @@
+"""Файловый кеш с атомарным add() и редкой очисткой.
+
+В FileBasedCache из Django add() — это has_key() и затем set(): два
+воркера могут оба «взять» блокировку единственного пересчёта
+(posts.caching). Здесь add() для ключа выполняется под файлом
+блокировки, созданным с O_EXCL: проверку и запись делает только один
+воркер, а остальные в это время получают False — запись уже
+добавляется. Атомарность держится в пределах одной локальной файловой
+системы; на нескольких хостах нужен общий кеш с атомарным add —
+memcached или redis.
+
+Кроме того, set() в Django перед каждой записью перечисляет весь
+каталог кеша (_cull), и каждая запись дорожает по мере заполнения
+кеша. Здесь каталог проверяется не чаще раза в CULL_INTERVAL секунд.
+"""
+import os
+import pickle
+import tempfile
+import time
+
+from django.core.cache.backends import filebased
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+CULL_INTERVAL = 60
+# Блокировку старше этого срока оставил упавший воркер.
+LOCK_STALE = 30
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._next_cull = 0
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        self._cull()
+        lock = f'{fname}.lock'
+        if not self._acquire(lock):
+            return False
+        try:
+            if not self._expired(fname):
+                return False
+            fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+            renamed = False
+            try:
+                with open(fd, 'wb') as f:
+                    self._write_content(f, timeout, value)
+                os.replace(tmp_path, fname)
+                renamed = True
+            finally:
+                if not renamed:
+                    os.remove(tmp_path)
+            return True
+        finally:
+            os.remove(lock)
+
+    def _acquire(self, lock):
+        for _ in range(2):
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                pass
+            try:
+                age = time.time() - os.path.getmtime(lock)
+            except FileNotFoundError:
+                # Блокировку только что сняли.
+                continue
+            if age < LOCK_STALE:
+                return False
+            try:
+                os.remove(lock)
+            except FileNotFoundError:
+                pass
+        return False
+
+    def _expired(self, fname):
+        # В отличие от _is_expired ничего не удаляет: истёкшую запись
+        # заменит os.replace.
+        try:
+            with open(fname, 'rb') as f:
+                expiry = pickle.load(f)
+        except FileNotFoundError:
+            return True
+        except EOFError:
+            expiry = 0
+        return expiry is not None and expiry < time.time()
+
+    def _cull(self):
+        now = time.monotonic()
+        if now < self._next_cull:
+            return
+        self._next_cull = now + CULL_INTERVAL
+        super()._cull()
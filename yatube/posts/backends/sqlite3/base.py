@@ -0,0 +1,15 @@
+"""SQLite, у которого транзакции сразу берут блокировку записи.
+
+Обычный BEGIN откладывает блокировку до первой записи. Если в
+транзакции сначала читают (get_or_create, delete() со сбором связей),
+а другой писатель успел зафиксировать изменения, SQLite не может
+повысить блокировку и сразу отвечает «database is locked», не дожидаясь
+busy_timeout. BEGIN IMMEDIATE ждёт писателя с начала транзакции; в
+режиме WAL читатели вне транзакций при этом не блокируются.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,518 @@
+"""Нагрузочные замеры страниц и API по синтетическим данным.
+
+seed() наполняет базу пользователями, группами, постами, комментариями
+и подписками (mixer и Faker, как в фикстурах tests/fixtures), затем
+measure() проходит по всем маршрутам posts.urls тестовым клиентом
+Django и для каждого считает задержку (p50, p99), число SQL-запросов
+и пик выделенной памяти (tracemalloc). Результаты сравниваются с
+сохранённым базовым замером: compare() возвращает список регрессий.
+
+measure_writes() нагружает запись: несколько клиентов одновременно
+добавляют комментарии, посты и подписки по HTTP, каждый от своего
+пользователя, через локальный сервер posts.loadgen.
+
+Запускаются командами benchmark и benchmark_writes, см. их --help.
+"""
+import json
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from statistics import median
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from django.utils.http import urlencode
+from faker import Faker
+from mixer.backend.django import mixer
+
+from . import counters, feeds, importing, search, writebuffer
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SCALE = {
+    'users': 200,
+    'groups': 20,
+    'posts': 10000,
+    'comments': 20000,
+    'follows': 2000,
+}
+# Данные растянуты на год, чтобы ленты листались по реальным датам.
+SEED_PERIOD = timedelta(days=365)
+# Маршруты, которые меняют данные даже по GET: замер подписок
+# перепутал бы данные остальных замеров.
+MUTATING_ROUTES = ('profile_follow', 'profile_unfollow')
+# Допустимый рост метрик относительно базового замера.
+LATENCY_TOLERANCE = 0.25
+ALLOCATION_TOLERANCE = 0.25
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def _timestamps(rng, count, now):
+    start = now - SEED_PERIOD
+    seconds = SEED_PERIOD.total_seconds()
+    return sorted(
+        start + timedelta(seconds=rng.random() * seconds)
+        for _ in range(count)
+    )
+
+
+def seed(scale=None, seed_value=0, log=None):
+    """Наполнить текущую базу синтетическими данными.
+
+    scale — словарь размеров как в SCALE. Возвращает фактические
+    размеры. Производные данные (счётчики, ленты подписок, поисковый
+    индекс) строятся так же, как их строят команды обслуживания.
+    """
+    scale = dict(SCALE, **(scale or {}))
+    rng = random.Random(seed_value)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed_value)
+    now = timezone.now()
+    log = log or (lambda message: None)
+
+    with transaction.atomic():
+        users = mixer.cycle(scale['users']).blend(
+            User,
+            username=mixer.sequence('bench{0}'),
+            first_name=mixer.sequence(lambda number: fake.first_name()),
+            last_name=mixer.sequence(lambda number: fake.last_name()),
+        )
+        groups = mixer.cycle(scale['groups']).blend(
+            Group,
+            title=mixer.sequence('Группа {0}'),
+            slug=mixer.sequence('bench-group-{0}'),
+            description=mixer.sequence(lambda number: fake.sentence()),
+        )
+        log(f'Пользователей: {len(users)}, групп: {len(groups)}.')
+
+        # Активность распределена неравномерно, как на живом сайте:
+        # у немногих авторов большая часть постов и подписчиков.
+        weights = [1 / (rank + 1) for rank in range(len(users))]
+        importing.dated(Post).bulk_create(
+            (
+                Post(
+                    author=rng.choices(users, weights)[0],
+                    group=rng.choice(groups + [None]),
+                    text=fake.text(max_nb_chars=rng.randint(50, 600)),
+                    pub_date=moment,
+                    updated=moment,
+                )
+                for moment in _timestamps(rng, scale['posts'], now)
+            )
+        )
+        log(f'Постов: {scale["posts"]}.')
+        post_ids = list(Post.objects.values_list('id', flat=True))
+        post_weights = [
+            1 / (rank + 1) for rank in range(len(post_ids))
+        ]
+        importing.dated(Comment).bulk_create(
+            (
+                Comment(
+                    post_id=rng.choices(post_ids, post_weights)[0],
+                    author=rng.choice(users),
+                    text=fake.sentence(),
+                    created=moment,
+                )
+                for moment in _timestamps(rng, scale['comments'], now)
+            )
+        )
+        log(f'Комментариев: {scale["comments"]}.')
+
+        pairs = set()
+        limit = min(scale['follows'], len(users) * (len(users) - 1))
+        while len(pairs) < limit:
+            user, author = rng.choice(users), rng.choices(users, weights)[0]
+            if user != author:
+                pairs.add((user.id, author.id))
+        Follow.objects.bulk_create(
+            [Follow(user_id=user, author_id=author) for user, author in pairs]
+        )
+        feeds.rebuild()
+        log(f'Подписок: {len(pairs)}.')
+
+    counters.recount()
+    search.rebuild()
+    return dict(scale, follows=len(pairs))
+
+
+def sample_kwargs():
+    """Значения параметров маршрутов: самые «тяжёлые» объекты."""
+    post = Post.objects.order_by('-comments_count', '-id').first()
+    group = Group.objects.annotate(total=Count('posts')).order_by(
+        '-total'
+    ).first()
+    author = User.objects.order_by('-stats__followers_count').first()
+    return {
+        'post_id': post and post.id,
+        'slug': group and group.slug,
+        'username': author and author.username,
+        'kind': 'posts',
+        'format': 'jsonl',
+    }
+
+
+def sample_query():
+    """Запрос для страницы поиска: частое слово из текста постов."""
+    words = search.tokenize(' '.join(
+        Post.objects.order_by('-id').values_list('text', flat=True)[:50]
+    ))
+    common = Counter(word for word in words if len(word) > 4).most_common(1)
+    return common[0][0] if common else 'пост'
+
+
+def discover_urls(namespace='posts'):
+    """Пары (имя, URL) для маршрутов пространства имён и пропущенные.
+
+    Пропускаются маршруты из MUTATING_ROUTES и те, для параметров
+    которых в базе нет объектов.
+    """
+    resolver = get_resolver().namespace_dict[namespace][1]
+    kwargs = sample_kwargs()
+    urls = []
+    skipped = []
+    for pattern in resolver.url_patterns:
+        params = list(pattern.pattern.converters)
+        if pattern.name in MUTATING_ROUTES or any(
+            kwargs.get(param) is None for param in params
+        ):
+            skipped.append(pattern.name)
+            continue
+        url = reverse(
+            f'{namespace}:{pattern.name}',
+            kwargs={param: kwargs[param] for param in params}
+        )
+        if pattern.name == 'search':
+            url += '?' + urlencode({'q': sample_query()})
+        urls.append((pattern.name, url))
+    return urls, skipped
+
+
+def make_clients():
+    """Клиенты сценариев: аноним и пользователь с подписками."""
+    reader = User.objects.order_by('-stats__following_count').first()
+    user_client = Client()
+    user_client.force_login(reader)
+    return {'anonymous': Client(), 'user': user_client}
+
+
+def fetch(client, url):
+    """GET с чтением всего ответа.
+
+    Потоковый ответ (выгрузки) формируется, пока его читают: без
+    чтения в замер попали бы только заголовки.
+    """
+    response = client.get(url)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def measure_url(client, url, iterations=50, warmup=5):
+    for _ in range(warmup):
+        fetch(client, url)
+    timings = []
+    queries = []
+    # Страница ошибки обычно быстрее и дешевле настоящей: без счёта
+    # ошибок сломанный URL выглядел бы улучшением.
+    errors = 0
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = fetch(client, url)
+            timings.append(time.perf_counter() - started)
+        queries.append(len(captured.captured_queries))
+        errors += response.status_code >= 400
+    # Память меряется отдельным запросом: трассировка замедляет код.
+    tracemalloc.start()
+    try:
+        fetch(client, url)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'queries': median(queries),
+        'alloc_kib': round(peak / 1024, 1),
+        'errors': errors,
+    }
+
+
+def measure(urls, clients, iterations=50, warmup=5, log=None):
+    """Замерить каждый URL в каждом сценарии.
+
+    Возвращает словарь '<имя> <сценарий>' -> метрики.
+    """
+    log = log or (lambda message: None)
+    results = {}
+    for name, url in urls:
+        for scenario, client in clients.items():
+            result = measure_url(client, url, iterations, warmup)
+            result['url'] = url
+            results[f'{name} {scenario}'] = result
+            log(
+                f'{name} {scenario}: {result["status"]}, '
+                f'p50 {result["p50_ms"]} мс, p99 {result["p99_ms"]} мс, '
+                f'{result["queries"]} запросов, {result["alloc_kib"]} КиБ, '
+                f'ошибок {result["errors"]}'
+            )
+    return results
+
+
+WRITE_SCENARIOS = ('comment', 'post', 'follow')
+# Всплеск комментариев во время события приходится на несколько постов.
+HOT_POSTS = 10
+
+
+def _write_requests(usernames, posts, rng, scenarios=WRITE_SCENARIOS):
+    """Бесконечная смесь записей: (сценарий, метод, путь, данные)."""
+    while True:
+        for scenario in scenarios:
+            if scenario == 'comment':
+                yield scenario, 'POST', reverse(
+                    'posts:add_comment',
+                    kwargs={'post_id': rng.choice(posts)}
+                ), {'text': f'Комментарий {rng.random()}'}
+            elif scenario == 'post':
+                yield scenario, 'POST', reverse('posts:post_create'), {
+                    'text': f'Пост {rng.random()}'
+                }
+            else:
+                action = rng.choice(('profile_follow', 'profile_unfollow'))
+                yield scenario, 'GET', reverse(
+                    f'posts:{action}',
+                    kwargs={'username': rng.choice(usernames)}
+                ), None
+
+
+def hot_posts():
+    return list(Post.objects.order_by('-pub_date').values_list(
+        'id', flat=True
+    )[:HOT_POSTS])
+
+
+def write_sessions(count):
+    """Cookie сессий и CSRF для count разных пользователей."""
+    sessions = []
+    for user in User.objects.order_by('id')[:count]:
+        client = Client()
+        client.force_login(user)
+        token = get_random_string(32)
+        sessions.append({
+            'cookies': {
+                settings.SESSION_COOKIE_NAME: client.cookies[
+                    settings.SESSION_COOKIE_NAME
+                ].value,
+                settings.CSRF_COOKIE_NAME: token,
+            },
+            'headers': {'X-CSRFToken': token},
+        })
+    return sessions
+
+
+def measure_writes(base_url, concurrency=4, requests_per_client=30,
+                   seed_value=0, drain=None, scenarios=WRITE_SCENARIOS):
+    """Записи по HTTP от concurrency клиентов одновременно.
+
+    Каждый клиент — свой пользователь и свой поток, requests_per_client
+    запросов подряд. Возвращает метрики по сценариям и суммарно
+    ('all'): p50, p99, записей в секунду и число ошибок — ответов 5xx,
+    например на «database is locked». drain() вызывается после запросов
+    и входит в замер времени: с буфером записи запросы отвечают раньше,
+    чем данные попадают в базу.
+    """
+    sessions = write_sessions(concurrency)
+    usernames = [user.username for user in User.objects.order_by('id')]
+    posts = hot_posts()
+    outcomes = []
+    lock = threading.Lock()
+
+    def client_thread(number):
+        rng = random.Random(seed_value + number)
+        session = requests.Session()
+        session.cookies.update(sessions[number % len(sessions)]['cookies'])
+        session.headers.update(sessions[number % len(sessions)]['headers'])
+        writes = _write_requests(usernames, posts, rng, scenarios)
+        for _ in range(requests_per_client):
+            scenario, method, path, data = next(writes)
+            started = time.perf_counter()
+            try:
+                response = session.request(
+                    method, base_url + path, data=data,
+                    allow_redirects=False
+                )
+                failed = response.status_code >= 400
+            except requests.RequestException:
+                failed = True
+            timing = time.perf_counter() - started
+            with lock:
+                outcomes.append((scenario, timing, failed))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(client_thread, range(concurrency)))
+    if drain is not None:
+        drain()
+    elapsed = time.perf_counter() - started
+
+    groups = {'all': outcomes}
+    for outcome in outcomes:
+        groups.setdefault(outcome[0], []).append(outcome)
+    results = {}
+    for scenario, group in groups.items():
+        timings = [timing for _, timing, _ in group]
+        results[scenario] = {
+            'p50_ms': round(percentile(timings, 50) * 1000, 3),
+            'p99_ms': round(percentile(timings, 99) * 1000, 3),
+            'rps': round(len(group) / elapsed, 1),
+            'errors': sum(failed for _, _, failed in group),
+        }
+    return results
+
+
+def measure_write_path(concurrency=8, operations=200, seed_value=0):
+    """Комментарии из concurrency потоков без HTTP: только путь до базы.
+
+    Каждый поток добавляет operations комментариев так же, как
+    add_comment: сразу или через буфер записи, если он включён; замер
+    включает запись всего буфера. Возвращает записей в секунду и
+    число ошибок.
+    """
+    users = list(User.objects.order_by('id')[:concurrency])
+    posts = hot_posts()
+    errors = []
+
+    def client_thread(number):
+        rng = random.Random(seed_value + number)
+        user = users[number % len(users)]
+        try:
+            for _ in range(operations):
+                post_id = rng.choice(posts)
+                text = f'Комментарий {rng.random()}'
+                try:
+                    if writebuffer.enabled():
+                        writebuffer.submit_comment(user, post_id, text)
+                    else:
+                        writebuffer.save_comment(user.id, post_id, text)
+                except Exception:
+                    errors.append(post_id)
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(client_thread, range(concurrency)))
+    writebuffer.flush()
+    elapsed = time.perf_counter() - started
+    return {
+        'rps': round(concurrency * operations / elapsed, 1),
+        'errors': len(errors),
+    }
+
+
+def isolated_settings(directory):
+    """Настройки замеров: без отладки и с кешем в directory."""
+    caches = {}
+    for alias, config in settings.CACHES.items():
+        config = dict(config)
+        if config['BACKEND'].endswith('FileBasedCache'):
+            config['LOCATION'] = os.path.join(directory, 'cache', alias)
+        else:
+            config['KEY_PREFIX'] = 'benchmark'
+        caches[alias] = config
+    return {
+        'DEBUG': False,
+        'ALLOWED_HOSTS': list(settings.ALLOWED_HOSTS) + ['testserver'],
+        'CACHES': caches,
+    }
+
+
+@contextmanager
+def temporary_database(directory):
+    """Отдельная база на время замеров, для SQLite — файл в directory.
+
+    SQLite в памяти не видно из других потоков, а замерам нужен файл.
+    """
+    if connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            directory, 'benchmark.sqlite3'
+        )
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def _grew(current, baseline, tolerance):
+    return current > baseline * (1 + tolerance)
+
+
+def compare(results, baseline,
+            latency_tolerance=LATENCY_TOLERANCE,
+            allocation_tolerance=ALLOCATION_TOLERANCE):
+    """Список регрессий относительно базового замера.
+
+    Число запросов и ошибок сравнивается точно, задержка p50 и
+    память — с допуском: p99 на коротком прогоне слишком шумный для
+    проверки. Разделы, которых нет в базовом замере, пропускаются.
+    """
+    regressions = []
+    for key, current in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        for metric in ('queries', 'errors'):
+            if metric in current and current[metric] > old.get(metric, 0):
+                regressions.append(
+                    f'{key}: {metric} {old.get(metric, 0)} -> '
+                    f'{current[metric]}'
+                )
+        if _grew(current['p50_ms'], old['p50_ms'], latency_tolerance):
+            regressions.append(
+                f'{key}: p50 {old["p50_ms"]} -> {current["p50_ms"]} мс'
+            )
+        if 'alloc_kib' in current and _grew(
+            current['alloc_kib'], old['alloc_kib'], allocation_tolerance
+        ):
+            regressions.append(
+                f'{key}: память {old["alloc_kib"]} -> '
+                f'{current["alloc_kib"]} КиБ'
+            )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(path, report):
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump(report, baseline_file, ensure_ascii=False, indent=2,
+                  sort_keys=True)
@@ -0,0 +1,187 @@
+import hashlib
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import quote
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+
+# Версии пространств имён: при смене формата значений достаточно
+# поднять версию, и старые ключи перестанут читаться.
+NAMESPACE_VERSIONS = {
+    'fragment': 1,
+    'feeds': 1,
+    'freshness': 1,
+    'page': 1,
+    'pending': 1,
+}
+DEFAULT_TIMEOUT = 60 * 60
+# Сколько ещё хранить устаревшее значение, пока его пересчитывает
+# один воркер, а остальные отдают старое.
+STALE_GRACE = 60
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2
+LOCK_POLL = 0.05
+# Параметр вероятностного раннего пересчёта (XFetch); 0 — выключен.
+EARLY_RECOMPUTE_BETA = 1.0
+
+# Фрагменты шаблонов, которые кешируются тегом {% cachefragment %}.
+# Карточка поста и тело поста зависят от (id, updated),
+# поэтому правка поста сама по себе даёт новый ключ.
+POST_CARD = 'post_card'
+POST_CARD_VARIANTS = ('feed', 'group', 'profile')
+POST_BODY = 'post_body'
+POST_COMMENTS = 'post_comments'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(namespace, event):
+    with _stats_lock:
+        _stats[namespace, event] += 1
+    metrics.count_cache(namespace, event)
+
+
+def stats():
+    """Счётчики попаданий и промахов по пространствам имён."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def make_key(namespace, *parts):
+    version = NAMESPACE_VERSIONS[namespace]
+    raw = ':'.join(quote(str(part)) for part in parts)
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'posts:{namespace}:v{version}:{digest}'
+
+
+def get_or_compute(namespace, key, compute, timeout=DEFAULT_TIMEOUT):
+    """Прочитать значение из кеша или вычислить его.
+
+    Значение хранится вместе со временем логического истечения и
+    длительностью последнего пересчёта. Незадолго до истечения
+    запрос с вероятностью, растущей к концу срока, пересчитывает его
+    заранее; после истечения пересчитывает только тот воркер, что
+    взял блокировку, а остальные отдают устаревшее значение.
+    """
+    envelope = cache.get(key)
+    if envelope is not None:
+        value, expires_at, delta = envelope
+        if not _should_recompute(expires_at, delta):
+            _count(namespace, 'hit')
+            return value
+        token = _acquire(key)
+        if token is None:
+            _count(namespace, 'stale')
+            return value
+        _count(namespace, 'recompute')
+        return _compute_and_store(key, compute, timeout, token)
+
+    _count(namespace, 'miss')
+    token = _acquire(key)
+    if token is not None:
+        return _compute_and_store(key, compute, timeout, token)
+    # Значение уже считает другой воркер: ждём его немного.
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        envelope = cache.get(key)
+        if envelope is not None:
+            _count(namespace, 'wait')
+            return envelope[0]
+    return _compute_and_store(key, compute, timeout)
+
+
+def _should_recompute(expires_at, delta):
+    now = time.time()
+    if now >= expires_at:
+        return True
+    if not EARLY_RECOMPUTE_BETA:
+        return False
+    return now - delta * EARLY_RECOMPUTE_BETA * math.log(
+        1 - random.random()
+    ) >= expires_at
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _acquire(key):
+    """Взять блокировку пересчёта; вернуть её токен или None."""
+    token = uuid.uuid4().hex
+    if cache.add(_lock_key(key), token, LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def _release(key, token):
+    # Если пересчёт шёл дольше LOCK_TIMEOUT, блокировка истекла и её
+    # мог взять другой воркер: чужую не снимаем, её снимет владелец
+    # или срок. Между get и delete окно остаётся, но лишь на случай,
+    # когда наша блокировка истекает именно в этот момент.
+    lock = _lock_key(key)
+    if cache.get(lock) == token:
+        cache.delete(lock)
+
+
+def _compute_and_store(key, compute, timeout, token=None):
+    try:
+        started = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - started
+        cache.set(
+            key, (value, time.time() + timeout, delta), timeout + STALE_GRACE
+        )
+        return value
+    finally:
+        if token is not None:
+            _release(key, token)
+
+
+def delete(*keys):
+    # И ещё раз после фиксации: запрос в промежутке мог закешировать
+    # фрагмент заново из ещё не изменённых строк.
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def fragment_key(name, *vary_on):
+    return make_key('fragment', name, *vary_on)
+
+
+def post_fragment_keys(posts):
+    """Ключи всех фрагментов для пар (id, updated)."""
+    keys = []
+    for post_id, updated in posts:
+        keys.extend(
+            fragment_key(POST_CARD, post_id, updated, variant)
+            for variant in POST_CARD_VARIANTS
+        )
+        keys.append(fragment_key(POST_BODY, post_id, updated))
+    return keys
+
+
+def invalidate_post(post):
+    delete(*post_fragment_keys([(post.id, post.updated)]))
+    invalidate_comments([post.id])
+
+
+def invalidate_posts(queryset):
+    delete(*post_fragment_keys(queryset.values_list('id', 'updated')))
+
+
+def invalidate_comments(post_ids):
+    delete(*[fragment_key(POST_COMMENTS, post_id) for post_id in post_ids])
@@ -0,0 +1,112 @@
+"""Параллельные независимые запросы внутри одного view.
+
+Страница профиля ждёт три запроса, которые друг от друга не зависят:
+автора, страницу его постов и проверку подписки. Последовательно их
+время складывается, а gather() выполняет их одновременно — первый в
+потоке запроса, остальные в ограниченном пуле — и время страницы
+становится временем самого долгого запроса.
+
+Это замена асинхронным view: в Django 2.2 нет ни ASGI-обработчика, ни
+async def view, а ORM синхронный, так что «await в пуле потоков»
+здесь и так свелось бы к тому же пулу. Размер пула задаёт настройка
+POSTS_QUERY_THREADS; 0 — всё последовательно, в потоке запроса. Пул
+окупается только с постоянными соединениями к серверной базе: с
+SQLite при CONN_MAX_AGE=0 задача тратит на открытие соединения
+больше, чем экономит, поэтому там настройка по умолчанию 0.
+
+Последовательно gather() работает и внутри транзакции (включая
+TestCase): соединение пула не увидит её незафиксированных данных.
+Каждый поток пула держит своё соединение с базой (по CONN_MAX_AGE, как
+поток запроса), так что воркеру нужно до POSTS_QUERY_THREADS
+соединений сверх своего.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from . import metrics
+
+DEFAULT_THREADS = 0
+
+_executor = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def pool_size():
+    return getattr(settings, 'POSTS_QUERY_THREADS', DEFAULT_THREADS)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=pool_size(), thread_name_prefix='queries'
+            )
+        return _executor
+
+
+def sequential(calls):
+    return (
+        len(calls) < 2
+        or not pool_size()
+        or connection.in_atomic_block
+        # Задача пула, ждущая другие задачи того же пула, может
+        # не дождаться свободного потока.
+        or getattr(_local, 'in_pool', False)
+    )
+
+
+def gather(*calls):
+    """Выполнить функции без аргументов и вернуть их результаты.
+
+    Функции должны сами вычислять QuerySet (list, exists, get): ленивый
+    QuerySet выполнился бы уже в потоке запроса.
+    """
+    if sequential(calls):
+        return [call() for call in calls]
+    # Замер запросов (metrics, profiling) — обёртки соединения потока
+    # запроса; в потоке пула их ставим на его соединение.
+    wrappers = list(connection.execute_wrappers)
+    sample = metrics.current()
+    executor = _get_executor()
+    futures = [
+        executor.submit(_run, call, wrappers, sample) for call in calls[1:]
+    ]
+    try:
+        first = calls[0]()
+    finally:
+        # Результаты остальных ждём и при ошибке первой функции, чтобы
+        # не оставлять работу пула после ответа.
+        results = [_result(future) for future in futures]
+    for result, error in results:
+        if error is not None:
+            raise error
+    return [first] + [result for result, _ in results]
+
+
+def _result(future):
+    try:
+        return future.result(), None
+    except Exception as error:
+        return None, error
+
+
+def _run(call, wrappers, sample):
+    # Как Django на каждый запрос: соединение потока пула живёт по
+    # CONN_MAX_AGE, а сломанное или устаревшее заменяется до задачи.
+    close_old_connections()
+    _local.in_pool = True
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(metrics.attach(sample))
+            for wrapper in wrappers:
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return call()
+    finally:
+        _local.in_pool = False
+        close_old_connections()
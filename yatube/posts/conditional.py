@@ -0,0 +1,169 @@
+"""Условные ответы (304) и заголовки кеширования для страниц.
+
+Свежесть страницы определяется метками времени областей (scopes) в
+общем кеше: 'posts' — любая лента, 'group:<slug>', 'author:<username>',
+'post:<id>' и 'site' — редкие изменения, которые видны везде
+(группы, имена пользователей). Группа и автор адресуются так же,
+как в URL, поэтому для проверки свежести их не нужно искать в базе.
+Сигналы обновляют метки при записи (touch), а декоратор fresh_when
+собирает из меток нужных областей ETag и Last-Modified одним
+запросом к кешу, не трогая базу ради содержимого страницы.
+
+Если метки в кеше нет (кеш очищен, вытеснен или срок истёк), она
+создаётся с текущим временем: страница лишь один раз отдаётся целиком.
+"""
+import hashlib
+import time
+from calendar import timegm
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date, quote_etag
+
+from . import caching
+
+# Сколько секунд общий кеш (CDN, прокси) может отдавать анонимную
+# страницу без перепроверки; браузер перепроверяет всегда.
+PUBLIC_MAX_AGE = 60
+# Метки живут долго, но не вечно: запрос к несуществующей группе
+# тоже создаёт метку, и такие метки должны уходить из кеша сами.
+STAMP_TIMEOUT = 7 * 24 * 60 * 60
+
+SITE = 'site'
+POSTS = 'posts'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def _stamp_key(scope):
+    return caching.make_key('freshness', scope)
+
+
+def touch(*scopes):
+    """Отметить, что данные областей изменились."""
+    def stamp():
+        cache.set_many(
+            {_stamp_key(scope): time.time() for scope in scopes},
+            STAMP_TIMEOUT
+        )
+
+    # Запрос, прочитавший новые метки до фиксации пишущей транзакции,
+    # видит старые строки и кеширует старую страницу под новым ETag.
+    # Поэтому метки ставятся ещё раз после фиксации, и такая страница
+    # остаётся под ключом, который больше не спросят. Первая отметка
+    # нужна самой транзакции и тестам, где фиксации не бывает.
+    stamp()
+    transaction.on_commit(stamp)
+
+
+def post_scopes(post_id, username, *slugs):
+    scopes = [POSTS, post_scope(post_id), author_scope(username)]
+    scopes.extend(group_scope(slug) for slug in slugs if slug)
+    return scopes
+
+
+def touch_posts(queryset):
+    scopes = set()
+    for post_id, username, slug in queryset.values_list(
+        'id', 'author__username', 'group__slug'
+    ):
+        scopes.update(post_scopes(post_id, username, slug))
+    if scopes:
+        touch(*scopes)
+
+
+def stamps(*scopes):
+    keys = {_stamp_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, STAMP_TIMEOUT)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def make_etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def conditional(request, etag, last_modified, build):
+    """Вернуть 304 по заголовкам запроса или собрать ответ build().
+
+    ETag и Last-Modified ставятся только на успешные ответы.
+    """
+    timestamp = last_modified and timegm(last_modified.utctimetuple())
+    response = get_conditional_response(
+        request, etag=quote_etag(etag), last_modified=timestamp
+    )
+    if response is None:
+        response = build()
+        if response.status_code != 200:
+            return response
+    response['ETag'] = quote_etag(etag)
+    if timestamp:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def patch_page_cache_headers(response, request):
+    # Страница зависит от пользователя, поэтому общий кеш хранит
+    # только анонимные версии, а браузер всегда перепроверяет.
+    patch_vary_headers(response, ['Cookie'])
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(
+            response, public=True, max_age=0, s_maxage=PUBLIC_MAX_AGE
+        )
+
+
+def fresh_response(request, values, build):
+    """Условный ответ страницы по меткам values.
+
+    В ETag входят ещё путь и пользователь: шапка и кнопки на
+    странице у каждого свои.
+    """
+    etag = make_etag(request.get_full_path(), request.user.pk, values)
+    last_modified = datetime.fromtimestamp(max(values), timezone.utc)
+    response = conditional(request, etag, last_modified, build)
+    if response.status_code in (200, 304):
+        patch_page_cache_headers(response, request)
+    return response
+
+
+def fresh_when(scopes_func):
+    """Отдавать 304, пока не изменились области scopes_func.
+
+    scopes_func(request, *args, **kwargs) возвращает список областей
+    или None, если объекта нет, — тогда view отрабатывает как обычно.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = scopes_func(request, *args, **kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+            return fresh_response(
+                request,
+                stamps(SITE, *scopes),
+                lambda: view(request, *args, **kwargs)
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import conditional
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def _bump(user_id, **deltas):
+    changes = {name: F(name) + delta for name, delta in deltas.items()}
+    if not UserStats.objects.filter(user_id=user_id).update(**changes):
+        # Строки ещё нет (пользователь старше счётчиков): считаем заново.
+        recount(user_ids=[user_id])
+
+
+def _drop(user_id, **deltas):
+    # Без пересчёта при отсутствии строки: при удалении пользователя
+    # его счётчики удаляются каскадом раньше постов и подписок, и
+    # пересчёт создал бы их заново для удаляемого пользователя.
+    UserStats.objects.filter(user_id=user_id).update(
+        **{name: F(name) - delta for name, delta in deltas.items()}
+    )
+
+
+def post_added(post):
+    _bump(post.author_id, posts_count=1)
+
+
+def post_removed(post):
+    _drop(post.author_id, posts_count=1)
+
+
+def comment_added(comment):
+    comments_added({comment.post_id: 1})
+
+
+def comments_added(totals):
+    """Добавить комментарии по словарю {id поста: сколько}."""
+    for post_id, total in totals.items():
+        Post.objects.filter(id=post_id).update(
+            comments_count=F('comments_count') + total
+        )
+
+
+def comment_removed(comment):
+    Post.objects.filter(id=comment.post_id).update(
+        comments_count=F('comments_count') - 1
+    )
+
+
+def followed(user_id, author_id):
+    _bump(user_id, following_count=1)
+    _bump(author_id, followers_count=1)
+
+
+def unfollowed(user_id, author_id):
+    _drop(user_id, following_count=1)
+    _drop(author_id, followers_count=1)
+
+
+def _count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('id')).values('total')
+        ),
+        0
+    )
+
+
+def recount(user_ids=None):
+    """Пересчитать все счётчики набором UPDATE ... SELECT COUNT(*).
+
+    Без user_ids пересчитываются все пользователи и все посты.
+    """
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id)
+            for user_id in users.filter(stats=None).values_list(
+                'id', flat=True
+            ).iterator()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    stats = UserStats.objects.filter(user__in=users)
+    stats.update(
+        posts_count=_count_subquery(Post.objects, 'author'),
+        followers_count=_count_subquery(Follow.objects, 'author'),
+        following_count=_count_subquery(Follow.objects, 'user'),
+    )
+    if user_ids is None:
+        Post.objects.update(
+            comments_count=_count_subquery(Comment.objects, 'post')
+        )
+    # Массовый UPDATE идёт мимо сигналов: страницы со счётчиками
+    # нужно перепроверить.
+    conditional.touch(conditional.SITE)
+    return stats.count()
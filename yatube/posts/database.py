@@ -0,0 +1,43 @@
+"""Настройка соединений SQLite.
+
+По умолчанию SQLite пишет через журнал отката: писатель блокирует
+читателей, а второй писатель сразу получает «database is locked».
+Прагмы из settings.POSTS_SQLITE_PRAGMAS применяются к каждому новому
+соединению (сигнал connection_created):
+- busy_timeout — сколько миллисекунд ждать чужую блокировку;
+- journal_mode=wal — читатели не ждут писателя;
+- synchronous=normal — в WAL fsync только на контрольных точках;
+- mmap_size — читать файл базы через отображение в память.
+"""
+from django.conf import settings
+
+# busy_timeout первым: переключение журнала тоже ждёт блокировку.
+ORDER = ('busy_timeout', 'journal_mode', 'synchronous', 'mmap_size')
+
+
+def sqlite_pragmas():
+    pragmas = getattr(settings, 'POSTS_SQLITE_PRAGMAS', {})
+    return sorted(
+        pragmas.items(),
+        key=lambda item: (
+            ORDER.index(item[0]) if item[0] in ORDER else len(ORDER)
+        )
+    )
+
+
+def configure_sqlite(connection):
+    """Выполнить прагмы на только что открытом соединении."""
+    for name, value in sqlite_pragmas():
+        if not name.isidentifier() or not str(value).isalnum():
+            raise ValueError(f'Некорректная прагма SQLite {name}={value}')
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def current_pragmas(connection):
+    """Действующие значения прагм, например для отчёта бенчмарка."""
+    with connection.cursor() as cursor:
+        values = {}
+        for name, value in sqlite_pragmas():
+            cursor.execute(f'PRAGMA {name}')
+            values[name] = cursor.fetchone()[0]
+    return values
@@ -0,0 +1,241 @@
+"""Потоковая выгрузка постов, комментариев и подписок.
+
+Записи читаются .values_list(...).iterator(chunk_size=CHUNK_SIZE), без
+создания объектов моделей, и сразу превращаются в строки JSONL или
+CSV; архив zip собирается на лету в режиме без перемотки (данные
+пишутся кусками, а размеры — в дескрипторах после каждого файла).
+Поэтому память не зависит от объёма выгрузки, и один и тот же
+генератор годится и для команды export_data, и для
+StreamingHttpResponse.
+
+Поля записей те же, что понимает import_data (posts.importing).
+"""
+import csv
+import json
+import zipfile
+from datetime import datetime
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
+from django.core.files.storage import default_storage
+from django.http import Http404, StreamingHttpResponse
+
+from .models import Comment, Follow, Post
+
+User = get_user_model()
+
+CHUNK_SIZE = 2000
+FILE_CHUNK_SIZE = 64 * 1024
+FORMATS = ('jsonl', 'csv')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'zip': 'application/zip',
+}
+KINDS = ('posts', 'comments', 'follows')
+FIELDS = {
+    'posts': ('id', 'text', 'author', 'group', 'pub_date', 'image'),
+    'comments': ('id', 'post', 'author', 'text', 'created'),
+    'follows': ('user', 'author'),
+}
+# Поля записей и пути к ним в .values().
+SOURCES = {
+    'posts': {
+        'id': 'id',
+        'text': 'text',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    },
+    'comments': {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    },
+    'follows': {
+        'user': 'user__username',
+        'author': 'author__username',
+    },
+}
+
+
+def querysets(user=None):
+    """Выгружаемые данные: всего сайта или одного пользователя.
+
+    У пользователя это его посты и комментарии, подписки не входят.
+    """
+    if user is None:
+        return {
+            'posts': Post.objects.all(),
+            'comments': Comment.objects.all(),
+            'follows': Follow.objects.exclude(user=None),
+        }
+    return {
+        'posts': Post.objects.filter(author=user),
+        'comments': Comment.objects.filter(author=user),
+    }
+
+
+def records(kind, queryset):
+    source = SOURCES[kind]
+    rows = queryset.order_by('pk').values_list(*source.values())
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield dict(zip(source, row))
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return '' if value is None else value
+
+
+class _Echo:
+    """Файлоподобный объект, который возвращает записанное."""
+
+    def write(self, value):
+        return value
+
+
+def render_jsonl(kind, rows):
+    for row in rows:
+        yield json.dumps(
+            {field: _value(value) for field, value in row.items()},
+            ensure_ascii=False
+        ) + '\n'
+
+
+def render_csv(kind, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS[kind])
+    for row in rows:
+        yield writer.writerow([_value(row[field]) for field in FIELDS[kind]])
+
+
+RENDERERS = {'jsonl': render_jsonl, 'csv': render_csv}
+
+
+def render(kind, queryset, format):
+    """Строки выгрузки одного вида записей."""
+    return RENDERERS[format](kind, records(kind, queryset))
+
+
+def image_names(posts):
+    names = posts.exclude(image='').order_by('pk').values_list(
+        'image', flat=True
+    )
+    return names.iterator(chunk_size=CHUNK_SIZE)
+
+
+class _ZipBuffer:
+    """Приёмник zipfile без seek: отдаёт записанное кусками."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _write_chunks(archive, buffer, name, chunks, compress):
+    info = zipfile.ZipInfo(name, datetime.now().timetuple()[:6])
+    info.compress_type = (
+        zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    )
+    with archive.open(info, 'w', force_zip64=True) as entry:
+        for chunk in chunks:
+            entry.write(chunk)
+            yield from _flush(buffer)
+    yield from _flush(buffer)
+
+
+def _flush(buffer):
+    data = buffer.take()
+    if data:
+        yield data
+
+
+def _file_chunks(name):
+    with default_storage.open(name, 'rb') as file:
+        while True:
+            chunk = file.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def render_zip(datasets, images=True):
+    """Архив: <вид>.jsonl для каждого queryset и картинки постов.
+
+    datasets — словарь как у querysets(). Картинки кладутся по своим
+    путям в хранилище без сжатия: они уже сжаты.
+    """
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for kind, queryset in datasets.items():
+            lines = (
+                line.encode() for line in render(kind, queryset, 'jsonl')
+            )
+            yield from _write_chunks(
+                archive, buffer, f'{kind}.jsonl', lines, compress=True
+            )
+        if images and 'posts' in datasets:
+            for name in image_names(datasets['posts']):
+                if not default_storage.exists(name):
+                    continue
+                yield from _write_chunks(
+                    archive, buffer, name, _file_chunks(name), compress=False
+                )
+    yield from _flush(buffer)
+
+
+def _attachment(content, filename, format):
+    response = StreamingHttpResponse(
+        content, content_type=CONTENT_TYPES[format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def user_archive(request):
+    return _attachment(
+        render_zip(querysets(request.user)),
+        f'yatube-{request.user.username}.zip',
+        'zip'
+    )
+
+
+@login_required
+def user_file(request, kind, format):
+    datasets = querysets(request.user)
+    if kind not in datasets or format not in FORMATS:
+        raise Http404
+    content = (
+        line.encode() for line in render(kind, datasets[kind], format)
+    )
+    return _attachment(
+        content, f'yatube-{request.user.username}-{kind}.{format}', format
+    )
+
+
+@staff_member_required
+def site_archive(request):
+    return _attachment(render_zip(querysets()), 'yatube.zip', 'zip')
@@ -0,0 +1,227 @@
+from django.db import connection
+from django.db.models import Count
+
+from . import caching
+from .models import FeedEntry, Follow, Post
+from .paginators import CursorPaginator
+
+# Сколько последних постов хранится в ленте одного пользователя.
+FEED_LENGTH = 500
+# Авторам с большим числом подписчиков ленты не рассылаются:
+# их посты подмешиваются в ленту при чтении.
+FANOUT_LIMIT = 1000
+POPULAR_AUTHORS_TIMEOUT = 300
+# Ленты подписчиков обрезаются при рассылке примерно каждого
+# TRIM_INTERVAL-го поста, так что лента превышает FEED_LENGTH в
+# среднем на TRIM_INTERVAL записей.
+TRIM_INTERVAL = 100
+
+
+def _popular_authors_key():
+    return caching.make_key('feeds', 'popular_authors')
+
+
+def popular_author_ids():
+    def compute():
+        return frozenset(
+            Follow.objects.values('author').annotate(
+                followers=Count('id')
+            ).filter(followers__gt=FANOUT_LIMIT).values_list(
+                'author', flat=True
+            )
+        )
+    return caching.get_or_compute(
+        'feeds',
+        _popular_authors_key(),
+        compute,
+        POPULAR_AUTHORS_TIMEOUT
+    )
+
+
+def fan_out(post):
+    """Разложить новый пост по лентам подписчиков автора."""
+    if post.author_id in popular_author_ids():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).exclude(user=None).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                post_id=post.id,
+                author_id=post.author_id,
+                pub_date=post.pub_date
+            )
+            for user_id in followers.iterator()
+        ],
+        batch_size=500,
+        ignore_conflicts=True
+    )
+    if post.id % TRIM_INTERVAL == 0:
+        trim_followers(post.author_id)
+
+
+def backfill(user_id, author_id):
+    """Добавить в ленту последние посты автора после подписки."""
+    if author_id in popular_author_ids():
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:FEED_LENGTH]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date
+            )
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True
+    )
+    trim(user_id)
+
+
+def _supports_window_functions():
+    # Django 2.2 не знает, что SQLite умеет OVER с версии 3.25.
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 25)
+    return connection.features.supports_over_clause
+
+
+def rebuild():
+    """Пересобрать ленты всех подписчиков. Возвращает число подписок.
+
+    Одним INSERT ... SELECT с ROW_NUMBER(): по FEED_LENGTH последних
+    постов на пользователя. Без оконных функций в базе — backfill
+    по каждой подписке.
+    """
+    FeedEntry.objects.all().delete()
+    follows = Follow.objects.exclude(user=None)
+    if not _supports_window_functions():
+        total = 0
+        for user_id, author_id in follows.values_list(
+            'user_id', 'author_id'
+        ).iterator():
+            backfill(user_id, author_id)
+            total += 1
+        return total
+    feed = FeedEntry._meta.db_table
+    post = Post._meta.db_table
+    follow = Follow._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {feed} (user_id, post_id, author_id, pub_date) '
+            f'SELECT user_id, post_id, author_id, pub_date FROM ('
+            f'SELECT f.user_id, p.id AS post_id, p.author_id, p.pub_date, '
+            f'ROW_NUMBER() OVER (PARTITION BY f.user_id '
+            f'ORDER BY p.pub_date DESC, p.id DESC) AS position '
+            f'FROM {follow} f JOIN {post} p ON p.author_id = f.author_id '
+            f'WHERE f.user_id IS NOT NULL AND f.author_id NOT IN ('
+            f'SELECT author_id FROM {follow} GROUP BY author_id '
+            f'HAVING COUNT(*) > %s)'
+            f') ranked WHERE position <= %s',
+            [FANOUT_LIMIT, FEED_LENGTH]
+        )
+    return follows.count()
+
+
+def trim(user_id):
+    """Обрезать ленту пользователя до FEED_LENGTH записей."""
+    entries = FeedEntry.objects.filter(user_id=user_id)
+    oldest_kept = entries.order_by('-pub_date', '-post_id').values_list(
+        'pub_date', 'post_id'
+    )[FEED_LENGTH - 1:FEED_LENGTH]
+    if not oldest_kept:
+        return
+    pub_date, post_id = oldest_kept[0]
+    entries.filter(pub_date__lte=pub_date).exclude(
+        pub_date=pub_date, post_id__gte=post_id
+    ).delete()
+
+
+def trim_followers(author_id):
+    """Обрезать переросшие ленты подписчиков автора."""
+    followers = Follow.objects.filter(author_id=author_id).values('user')
+    overgrown = FeedEntry.objects.filter(user__in=followers).values(
+        'user'
+    ).annotate(entries=Count('id')).filter(
+        entries__gt=FEED_LENGTH
+    ).values_list('user', flat=True)
+    for user_id in overgrown:
+        trim(user_id)
+
+
+def remove(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def demote(author_id):
+    """Вернуть рассылку автору, который выпал из популярных.
+
+    Посты, написанные, пока автор был популярен, в ленты не попали и
+    читались подмешиванием; без популярности их нужно добавить в
+    ленты подписчиков.
+    """
+    if author_id not in popular_author_ids():
+        return
+    followers = Follow.objects.filter(author_id=author_id)
+    if followers.count() > FANOUT_LIMIT:
+        return
+    caching.delete(_popular_authors_key())
+    for user_id in followers.exclude(user=None).values_list(
+        'user_id', flat=True
+    ).iterator():
+        backfill(user_id, author_id)
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорная лента подписок пользователя.
+
+    Читает материализованную ленту FeedEntry и подмешивает посты
+    популярных авторов, для которых рассылка при записи не делается.
+    Курсоры совместимы с обычной лентой постов: (pub_date, id).
+    """
+
+    entry_ordering = ('-pub_date', '-post_id')
+
+    def __init__(self, user, per_page):
+        # Страницы читает fetch(); object_list — та же лента запросом
+        # к постам, он нужен только count и номерам страниц.
+        super().__init__(
+            Post.objects.for_feed().filter(author__following__user=user),
+            per_page
+        )
+        self.user = user
+
+    def fetch(self, values, forward, limit):
+        entries = FeedEntry.objects.filter(user=self.user)
+        if values is not None:
+            entries = entries.filter(
+                self._seek(values, forward, fields=('pub_date', 'post_id'))
+            )
+        entries = entries.select_related(
+            'post__author', 'post__group'
+        ).order_by(*self._ordering(forward, self.entry_ordering))
+        posts = [entry.post for entry in entries[:limit]]
+
+        followed = list(Follow.objects.filter(
+            user=self.user, author__in=popular_author_ids()
+        ).values_list('author', flat=True))
+        if followed:
+            extra = Post.objects.for_feed().filter(author__in=followed)
+            if values is not None:
+                extra = extra.filter(self._seek(values, forward))
+            extra = extra.order_by(*self._ordering(forward))[:limit]
+            posts = self._merge(posts, list(extra), forward)
+        return posts[:limit]
+
+    def _merge(self, posts, extra, forward):
+        merged = {post.id: post for post in posts + extra}
+        return sorted(
+            merged.values(),
+            key=lambda post: (post.pub_date, post.id),
+            reverse=forward == self.descending
+        )
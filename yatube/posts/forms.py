@@ -1,12 +1,37 @@
 from django import forms
+from PIL import Image
 
+from . import uploads
 from .models import Comment, Post
 
 
+class PostImageField(forms.ImageField):
+    """Картинка поста с лимитами размера и нормализацией."""
+
+    def to_python(self, data):
+        if isinstance(data, uploads.RejectedUpload):
+            raise forms.ValidationError(data.error, code='too_large')
+        if data is not None:
+            try:
+                error = uploads.check_dimensions(uploads.open_image(data))
+            except (OSError, Image.DecompressionBombError):
+                raise forms.ValidationError(
+                    self.error_messages['invalid_image'],
+                    code='invalid_image'
+                )
+            if error:
+                raise forms.ValidationError(error, code='too_many_pixels')
+        data = super().to_python(data)
+        if data is None:
+            return None
+        return uploads.normalize(data, uploads.open_image(data))
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {'image': PostImageField}
 
     def clean_text(self):
         data = self.cleaned_data['text']
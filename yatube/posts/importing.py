@@ -0,0 +1,348 @@
+"""Массовый импорт постов, комментариев и подписок.
+
+Записи читаются потоком из JSONL или CSV, собираются в пачки по
+batch_size и пишутся bulk_create; транзакция фиксируется каждые
+commit_every записей. Ссылки на пользователей, группы и посты
+разрешаются одним запросом на пачку, а найденные id держатся в
+ограниченном кеше, поэтому память не зависит от размера файла.
+
+Даты постов и комментариев берутся из записей (dated), а пачка,
+нарушившая ограничение базы, пишется по одной записи, чтобы ошибку
+получили только виноватые записи.
+
+bulk_create идёт мимо сигналов, так что производные данные —
+счётчики, ленты подписок, поисковый индекс — пересчитываются после
+импорта целиком (finish_import).
+
+Форматы записей (лишние поля игнорируются):
+- post: text, author (username), group (slug), pub_date, id;
+- comment: post (id), author, text, created;
+- follow: user, author (username).
+"""
+import csv
+import io
+import json
+import sys
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caching, conditional, counters, feeds, search
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FORMATS = ('jsonl', 'csv')
+BATCH_SIZE = 1000
+COMMIT_EVERY = 20000
+# Сколько id держать в кеше каждого справочника.
+LOOKUP_LIMIT = 100000
+# Параметров в одном IN (...): у SQLite предел 999.
+LOOKUP_CHUNK = 500
+
+
+class InvalidRecord(Exception):
+    """Запись нельзя импортировать; импорт продолжается со следующей."""
+
+
+def read_records(stream, format):
+    """Записи из текстового потока: словари по одному на строку."""
+    if format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            record = {'_error': f'строка {number}: {error}'}
+        if not isinstance(record, dict):
+            record = {'_error': f'строка {number}: ожидался объект'}
+        yield record
+
+
+def open_input(path, format=None):
+    """Открыть файл ('-' — stdin) и определить формат по расширению."""
+    if format is None:
+        format = 'csv' if path.endswith('.csv') else 'jsonl'
+    if path == '-':
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    else:
+        stream = open(path, encoding='utf-8', newline='')
+    return stream, format
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class DatedQuerySet(models.QuerySet):
+    """QuerySet, чей bulk_create пишет даты объектов как есть.
+
+    auto_now и auto_now_add подставляют время в Field.pre_save, и все
+    записи пачки получили бы момент импорта. Вставка с raw=True берёт
+    значения прямо из объектов, как loaddata, и касается только
+    объектов этой вставки.
+    """
+
+    def _insert(self, *args, **kwargs):
+        kwargs['raw'] = True
+        return super()._insert(*args, **kwargs)
+
+
+def dated(model):
+    return DatedQuerySet(model)
+
+
+@contextmanager
+def dropped_indexes(models):
+    """Удалить индексы Meta.indexes на время импорта и создать заново.
+
+    Уникальные ограничения остаются: на них держится ignore_conflicts.
+    """
+    models = [model for model in models if model._meta.indexes]
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    moment = parse_datetime(value)
+    if moment is None:
+        raise InvalidRecord(f'некорректная дата {value!r}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.utc)
+    return moment
+
+
+def required(record, field):
+    value = record.get(field)
+    if value in (None, ''):
+        raise InvalidRecord(f'нет поля {field}')
+    return value
+
+
+class Lookup:
+    """id объектов по значению поля, с подгрузкой пачками."""
+
+    def __init__(self, queryset, field, create=None):
+        self.queryset = queryset
+        self.field = field
+        self.create = create
+        self.ids = {}
+
+    def resolve(self, values):
+        missing = {value for value in values if value not in self.ids}
+        if len(self.ids) + len(missing) > LOOKUP_LIMIT:
+            self.ids.clear()
+            missing = set(values)
+        self.load(missing)
+        absent = [value for value in missing if value not in self.ids]
+        if absent and self.create is not None:
+            self.create(absent)
+            self.load(absent)
+
+    def load(self, values):
+        for chunk in chunked(values, LOOKUP_CHUNK):
+            self.ids.update(self.queryset.filter(
+                **{f'{self.field}__in': chunk}
+            ).values_list(self.field, 'id'))
+
+    def __getitem__(self, value):
+        try:
+            return self.ids[value]
+        except KeyError:
+            raise InvalidRecord(f'не найден {self.field}={value!r}')
+
+
+def create_users(usernames):
+    users = [User(username=username) for username in usernames]
+    for user in users:
+        user.set_unusable_password()
+    User.objects.bulk_create(users, ignore_conflicts=True)
+
+
+def create_groups(slugs):
+    Group.objects.bulk_create(
+        [Group(slug=slug, title=slug, description='') for slug in slugs],
+        ignore_conflicts=True
+    )
+
+
+class Importer:
+    """Превращает пачку записей в объекты модели и сохраняет их."""
+
+    model = None
+    references = {}
+
+    def __init__(self, create_missing=False):
+        self.users = Lookup(
+            User.objects, 'username', create_missing and create_users or None
+        )
+        self.groups = Lookup(
+            Group.objects, 'slug', create_missing and create_groups or None
+        )
+        self.posts = Lookup(Post.objects, 'id')
+
+    def resolve(self, records):
+        values = {}
+        for field, lookup in self.references.items():
+            values.setdefault(lookup, set()).update(
+                self.reference(record, field) for record in records
+            )
+        for lookup, lookup_values in values.items():
+            getattr(self, lookup).resolve(lookup_values - {None})
+
+    def reference(self, record, field):
+        value = record.get(field)
+        if value in (None, ''):
+            return None
+        if field != 'post':
+            return value
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            # Ошибку покажет build() этой записи.
+            return None
+
+    def build(self, record):
+        raise NotImplementedError
+
+    def save(self, objects):
+        dated(self.model).bulk_create(objects)
+
+    def run(self, batch):
+        """Сохранить пачку; вернуть число записей и список ошибок."""
+        valid = []
+        errors = []
+        for record in batch:
+            if '_error' in record:
+                errors.append(record['_error'])
+            else:
+                valid.append(record)
+        self.resolve(valid)
+        built = []
+        for record in valid:
+            try:
+                built.append((record, self.build(record)))
+            except (InvalidRecord, ValueError) as error:
+                errors.append(f'{record}: {error}')
+        return self.store(built, errors), errors
+
+    def store(self, built, errors):
+        """Сохранить пары (запись, объект); вернуть число сохранённых."""
+        try:
+            with transaction.atomic():
+                self.save([obj for _, obj in built])
+            return len(built)
+        except IntegrityError:
+            pass
+        # Пачку отклонила база (например, занятый id): пишем по одной.
+        saved = 0
+        for record, obj in built:
+            try:
+                with transaction.atomic():
+                    self.save([obj])
+                saved += 1
+            except IntegrityError as error:
+                errors.append(f'{record}: {error}')
+        return saved
+
+
+class PostImporter(Importer):
+    model = Post
+    references = {'author': 'users', 'group': 'groups'}
+
+    def build(self, record):
+        pub_date = parse_date(record.get('pub_date'))
+        group = self.reference(record, 'group')
+        post = Post(
+            text=required(record, 'text'),
+            author_id=self.users[required(record, 'author')],
+            group_id=group and self.groups[group],
+            pub_date=pub_date,
+            updated=pub_date,
+        )
+        if record.get('id'):
+            post.id = int(record['id'])
+        return post
+
+
+class CommentImporter(Importer):
+    model = Comment
+    references = {'author': 'users', 'post': 'posts'}
+
+    def build(self, record):
+        return Comment(
+            post_id=self.posts[int(required(record, 'post'))],
+            author_id=self.users[required(record, 'author')],
+            text=required(record, 'text'),
+            created=parse_date(record.get('created')),
+        )
+
+
+class FollowImporter(Importer):
+    model = Follow
+    references = {'user': 'users', 'author': 'users'}
+
+    def build(self, record):
+        user_id = self.users[required(record, 'user')]
+        author_id = self.users[required(record, 'author')]
+        if user_id == author_id:
+            raise InvalidRecord('подписка на самого себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def save(self, objects):
+        # Повторная подписка из архива — не ошибка.
+        Follow.objects.bulk_create(objects, ignore_conflicts=True)
+
+
+IMPORTERS = {
+    'post': PostImporter,
+    'comment': CommentImporter,
+    'follow': FollowImporter,
+}
+
+
+def finish_import(log=None):
+    """Пересчитать производные данные после bulk_create."""
+    log = log or (lambda message: None)
+    total = counters.recount()
+    log(f'Счётчики пересчитаны: {total} пользователей.')
+    caching.delete(caching.make_key('feeds', 'popular_authors'))
+    with transaction.atomic():
+        total = feeds.rebuild()
+    log(f'Ленты подписок пересобраны: {total} подписок.')
+    with transaction.atomic():
+        total = search.rebuild()
+    log(f'Поисковый индекс пересобран: {total} постов.')
+    conditional.touch(conditional.SITE, conditional.POSTS)
+
+
+def reset_sequences():
+    """Сдвинуть автоинкремент постов за импортированные явные id."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [Post])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
@@ -0,0 +1,104 @@
+"""Простой генератор нагрузки на локальный WSGI-сервер.
+
+Тестовый клиент Django меряет код приложения в одном потоке; здесь
+тот же WSGI-обработчик поднимается в wsgiref-сервере в отдельном
+потоке, и несколько рабочих потоков параллельно ходят по списку URL
+по HTTP. Так видно, как страницы ведут себя при одновременных
+запросах: блокировки базы и кеша, сериализация ответа, заголовки.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import requests
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+from .benchmark import percentile
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _application():
+    handler = get_wsgi_application()
+
+    def application(environ, start_response):
+        try:
+            return handler(environ, start_response)
+        finally:
+            # Поток сервера живёт один запрос: соединение не переиспользуется.
+            connections.close_all()
+    return application
+
+
+class LocalServer:
+    """wsgiref-сервер приложения на свободном порту 127.0.0.1."""
+
+    def __init__(self):
+        self.server = make_server(
+            '127.0.0.1', 0, _application(),
+            server_class=ThreadingWSGIServer, handler_class=QuietHandler
+        )
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+def run(base_url, urls, concurrency=4, requests_per_url=50, cookies=None):
+    """Прогнать каждый URL requests_per_url раз в concurrency потоков.
+
+    urls — пары (имя, путь). Возвращает метрики по именам: p50, p99,
+    пропускную способность и число ответов с кодом 5xx или ошибкой сети.
+    """
+    results = {}
+    local = threading.local()
+
+    def fetch(path):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+            session.cookies.update(cookies or {})
+        started = time.perf_counter()
+        try:
+            response = session.get(base_url + path, allow_redirects=False)
+            failed = response.status_code >= 500
+        except requests.RequestException:
+            failed = True
+        return time.perf_counter() - started, failed
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        for name, path in urls:
+            started = time.perf_counter()
+            outcomes = list(executor.map(fetch, [path] * requests_per_url))
+            elapsed = time.perf_counter() - started
+            timings = [timing for timing, failed in outcomes]
+            results[name] = {
+                'p50_ms': round(percentile(timings, 50) * 1000, 3),
+                'p99_ms': round(percentile(timings, 99) * 1000, 3),
+                'rps': round(requests_per_url / elapsed, 1),
+                'errors': sum(failed for timing, failed in outcomes),
+            }
+    return results
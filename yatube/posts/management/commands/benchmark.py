@@ -0,0 +1,141 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from posts import benchmark, loadgen
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет отдельную базу синтетическими данными и замеряет '
+        'задержку, число запросов и память для всех URL posts. '
+        'Сравнивает результат с базовым замером и падает на регрессиях.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in benchmark.SCALE.items():
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Сколько создать объектов ({name}).'
+            )
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Сколько замеров делать на каждый URL.'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Сколько запросов сделать до замеров.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Потоков генератора нагрузки; 0 — без нагрузки по HTTP.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Сколько запросов на URL отправляет генератор нагрузки.'
+        )
+        parser.add_argument(
+            '--baseline',
+            default=os.path.join(settings.BASE_DIR, 'benchmark.json'),
+            help='Файл базового замера.'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результат как новый базовый замер.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float,
+            default=benchmark.LATENCY_TOLERANCE,
+            help='Допустимый рост p50, доля от базового замера.'
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                **benchmark.isolated_settings(directory)
+            ), benchmark.temporary_database(directory):
+                report = self.run(options)
+        self.compare(report, options)
+
+    def log(self, message):
+        self.stdout.write(message)
+
+    def run(self, options):
+        started = time.monotonic()
+        scale = benchmark.seed(
+            {name: options[name] for name in benchmark.SCALE}, log=self.log
+        )
+        self.log(f'Данные созданы за {time.monotonic() - started:.1f} с.')
+        urls, skipped = benchmark.discover_urls()
+        if skipped:
+            self.stderr.write(
+                f'Нет данных для маршрутов: {", ".join(skipped)}.'
+            )
+        clients = benchmark.make_clients()
+        report = {
+            'scale': scale,
+            'client': benchmark.measure(
+                urls, clients, options['iterations'], options['warmup'],
+                log=self.log
+            ),
+            'load': {},
+        }
+        if options['concurrency'] > 0:
+            cookies = {
+                scenario: client.cookies.get(settings.SESSION_COOKIE_NAME)
+                for scenario, client in clients.items()
+            }
+            with loadgen.LocalServer() as server:
+                for scenario, cookie in cookies.items():
+                    results = loadgen.run(
+                        server.url, urls, options['concurrency'],
+                        options['requests'],
+                        cookies=cookie and {cookie.key: cookie.value}
+                    )
+                    for name, result in results.items():
+                        report['load'][f'{name} {scenario}'] = result
+                        self.log(
+                            f'{name} {scenario} x{options["concurrency"]}: '
+                            f'p50 {result["p50_ms"]} мс, '
+                            f'p99 {result["p99_ms"]} мс, '
+                            f'{result["rps"]} запросов/с, '
+                            f'ошибок {result["errors"]}'
+                        )
+        return report
+
+    def compare(self, report, options):
+        path = options['baseline']
+        if options['save_baseline']:
+            benchmark.save_baseline(path, report)
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовый замер записан в {path}.'
+            ))
+            return
+        if not os.path.exists(path):
+            self.stdout.write(
+                f'Базового замера {path} нет: сравнивать не с чем. '
+                f'Сохраните его флагом --save-baseline.'
+            )
+            return
+        baseline = benchmark.load_baseline(path)
+        if baseline['scale'] != report['scale']:
+            raise CommandError(
+                f'Базовый замер сделан на других данных: '
+                f'{baseline["scale"]}.'
+            )
+        regressions = []
+        for section in ('client', 'load'):
+            regressions.extend(benchmark.compare(
+                report[section], baseline.get(section, {}),
+                latency_tolerance=options['tolerance']
+            ))
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно базового замера:\n'
+                + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
@@ -0,0 +1,112 @@
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from posts import benchmark, database, loadgen, writebuffer
+
+SCALE = {
+    'users': 50,
+    'groups': 5,
+    'posts': 1000,
+    'comments': 1000,
+    'follows': 200,
+}
+# Прагмы SQLite по умолчанию: журнал отката и fsync на каждой записи.
+PROFILES = {
+    'default': {'journal_mode': 'delete', 'synchronous': 'full'},
+    'tuned': None,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность записи (комментарии, посты, '
+        'подписки) при нескольких одновременных клиентах на отдельной '
+        'базе; сравнивает запись в запросе и через буфер, а для SQLite '
+        'ещё прагмы по умолчанию и настроенные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 4, 8],
+            help='Числа одновременных клиентов.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=30,
+            help='Сколько записей делает каждый клиент.'
+        )
+        parser.add_argument(
+            '--profile', choices=sorted(PROFILES), nargs='+',
+            default=sorted(PROFILES),
+            help='Наборы прагм SQLite: default и настроенные в settings.'
+        )
+        parser.add_argument(
+            '--operations', type=int, default=200,
+            help='Сколько комментариев пишет каждый поток в замере без HTTP.'
+        )
+        parser.add_argument(
+            '--scenarios', choices=benchmark.WRITE_SCENARIOS, nargs='+',
+            default=list(benchmark.WRITE_SCENARIOS),
+            help='Виды записей, которые клиенты делают по кругу.'
+        )
+        parser.add_argument(
+            '--write-buffer', choices=('off', 'thread'), nargs='+',
+            default=['off', 'thread'],
+            help='Писать в запросе (off) или через буфер записи (thread).'
+        )
+
+    def handle(self, *args, **options):
+        profiles = options['profile']
+        if connection.vendor != 'sqlite':
+            profiles = ['tuned']
+        for profile in profiles:
+            for buffer in options['write_buffer']:
+                self.run_isolated(profile, buffer, options)
+
+    def run_isolated(self, profile, buffer, options):
+        pragmas = PROFILES[profile] or settings.POSTS_SQLITE_PRAGMAS
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                POSTS_SQLITE_PRAGMAS=pragmas,
+                POSTS_WRITE_BUFFER=buffer,
+                **benchmark.isolated_settings(directory)
+            ), benchmark.temporary_database(directory):
+                self.run(f'{profile}/{buffer}', options)
+
+    def run(self, profile, options):
+        benchmark.seed(SCALE)
+        if connection.vendor == 'sqlite':
+            current = database.current_pragmas(connection)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{profile}: ' + ', '.join(
+                    f'{name}={value}' for name, value in current.items()
+                )
+            ))
+        with loadgen.LocalServer() as server:
+            for concurrency in options['concurrency']:
+                self.report(profile, concurrency, benchmark.measure_writes(
+                    server.url, concurrency, options['requests'],
+                    drain=writebuffer.flush, scenarios=options['scenarios']
+                ))
+        # Без HTTP: сколько комментариев в секунду принимает сама база.
+        for concurrency in options['concurrency']:
+            result = benchmark.measure_write_path(
+                concurrency, options['operations']
+            )
+            self.stdout.write(
+                f'{profile} без HTTP x{concurrency}: '
+                f'{result["rps"]} записей/с, ошибок {result["errors"]}'
+            )
+
+    def report(self, profile, concurrency, results):
+        for scenario, result in results.items():
+            self.stdout.write(
+                f'{profile} {scenario} x{concurrency}: '
+                f'{result["rps"]} записей/с, '
+                f'p50 {result["p50_ms"]} мс, '
+                f'p99 {result["p99_ms"]} мс, '
+                f'ошибок {result["errors"]}'
+            )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import templating
+
+
+class Command(BaseCommand):
+    help = (
+        'Разбирает все шаблоны проекта и приложений и падает, если '
+        'какой-то из них содержит синтаксическую ошибку. С кешированным '
+        'загрузчиком шаблоны остаются в кеше процесса.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count, errors = templating.precompile()
+        if errors:
+            raise CommandError(
+                f'Ошибки в шаблонах ({len(errors)} из {count}):\n'
+                + '\n'.join(f'{name}: {error}' for name, error in errors)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Разобрано шаблонов: {count} '
+            f'за {time.monotonic() - started:.2f} с.'
+        ))
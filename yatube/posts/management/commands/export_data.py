@@ -0,0 +1,88 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporting
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии и подписки сайта или одного '
+        'пользователя в zip с картинками, JSONL или CSV.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки; - — stdout.')
+        parser.add_argument(
+            '--user', help='Выгрузить посты и комментарии пользователя.'
+        )
+        parser.add_argument(
+            '--format', choices=('zip',) + exporting.FORMATS, default='zip'
+        )
+        parser.add_argument(
+            '--kind', choices=exporting.KINDS,
+            help='Вид записей для JSONL и CSV.'
+        )
+        parser.add_argument(
+            '--no-images', action='store_true',
+            help='Не класть картинки в zip.'
+        )
+
+    def handle(self, *args, **options):
+        datasets = exporting.querysets(self.get_user(options['user']))
+        chunks = self.chunks(datasets, options)
+        started = time.monotonic()
+        size = self.write(options['path'], chunks)
+        if options['path'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f'Записано {size} байт за '
+                f'{time.monotonic() - started:.1f} с.'
+            ))
+
+    def get_user(self, username):
+        if not username:
+            return None
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {username} не найден.')
+
+    def chunks(self, datasets, options):
+        """Куски выгрузки в байтах в выбранном формате."""
+        format = options['format']
+        if format == 'zip':
+            return exporting.render_zip(
+                datasets, images=not options['no_images']
+            )
+        kind = options['kind']
+        if kind not in datasets:
+            raise CommandError(
+                f'Для {format} укажите --kind: {", ".join(datasets)}.'
+            )
+        return (
+            line.encode()
+            for line in exporting.render(kind, datasets[kind], format)
+        )
+
+    def write(self, path, chunks):
+        """Записать куски в файл или stdout; вернуть размер в байтах."""
+        if path == '-':
+            output = sys.stdout.buffer
+        else:
+            try:
+                output = open(path, 'wb')
+            except OSError as error:
+                raise CommandError(error)
+        size = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                size += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        return size
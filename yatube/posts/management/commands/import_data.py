@@ -0,0 +1,110 @@
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import importing
+
+# Сколько ошибок записей показать, прежде чем только считать их.
+SHOWN_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты, комментарии или подписки из JSONL или CSV '
+        'пачками bulk_create и пересчитывает производные данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(importing.IMPORTERS))
+        parser.add_argument('path', help='Файл с записями; - — stdin.')
+        parser.add_argument(
+            '--format', choices=importing.FORMATS,
+            help='Формат файла; по умолчанию по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=importing.BATCH_SIZE,
+            help='Записей в одном bulk_create.'
+        )
+        parser.add_argument(
+            '--commit-every', type=int, default=importing.COMMIT_EVERY,
+            help='Записей в одной транзакции.'
+        )
+        parser.add_argument(
+            '--drop-indexes', action='store_true',
+            help='Удалить индексы модели на время импорта.'
+        )
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных пользователей и группы.'
+        )
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help=(
+                'Не пересчитывать счётчики, ленты и поиск: для серии '
+                'импортов, после последнего запустите без флага.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        importer = importing.IMPORTERS[options['kind']](
+            create_missing=options['create_missing']
+        )
+        try:
+            stream, format = importing.open_input(
+                options['path'], options['format']
+            )
+        except OSError as error:
+            raise CommandError(error)
+        batches = importing.chunked(
+            importing.read_records(stream, format), options['batch_size']
+        )
+        per_commit = max(1, options['commit_every'] // options['batch_size'])
+        self.started = time.monotonic()
+        self.imported = 0
+        self.errors = 0
+
+        with ExitStack() as stack:
+            stack.enter_context(stream)
+            if options['drop_indexes']:
+                stack.enter_context(
+                    importing.dropped_indexes([importer.model])
+                )
+            while self.commit(importer, batches, per_commit):
+                self.progress()
+
+        if options['kind'] == 'post':
+            importing.reset_sequences()
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано записей: {self.imported}, с ошибками: '
+            f'{self.errors}, {self.rate()}.'
+        ))
+        if not options['skip_derived']:
+            importing.finish_import(log=self.stdout.write)
+
+    def commit(self, importer, batches, per_commit):
+        """Транзакция из per_commit пачек; False, если записи кончились."""
+        done = 0
+        with transaction.atomic():
+            for batch in batches:
+                imported, errors = importer.run(batch)
+                self.imported += imported
+                for error in errors:
+                    self.errors += 1
+                    if self.errors <= SHOWN_ERRORS:
+                        self.stderr.write(error)
+                done += 1
+                if done == per_commit:
+                    return True
+        return False
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return (
+            f'{elapsed:.1f} с, '
+            f'{self.imported / elapsed if elapsed else 0:.0f} записей/с'
+        )
+
+    def progress(self):
+        self.stdout.write(f'Записано {self.imported}: {self.rate()}.')
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов, комментариев и подписок, '
+        'исправляя расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', dest='users', action='append', type=int,
+            help='Пересчитать только пользователя с этим id.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = counters.recount(user_ids=options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {total} '
+            f'за {time.monotonic() - started:.2f} с.'
+        ))
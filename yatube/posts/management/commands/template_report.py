@@ -0,0 +1,82 @@
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from posts import benchmark, templating
+
+# Данных хватает на полные страницы лент, а наполнение быстрое.
+SCALE = {
+    'users': 50,
+    'groups': 5,
+    'posts': 1000,
+    'comments': 2000,
+    'follows': 200,
+}
+DUMMY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Рендерит страницы posts на отдельной базе и печатает время '
+        'каждого шаблона и собственного тега: всего и без вложенных, '
+        'от самых дорогих.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=20,
+            help='Сколько раз запросить каждый URL в каждом сценарии.'
+        )
+        parser.add_argument(
+            '--with-cache', action='store_true',
+            help='Не отключать кеш: замерить то, что рендерится при '
+                 'попадании в кеш страниц и фрагментов.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=30,
+            help='Сколько строк отчёта вывести.'
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            overrides = benchmark.isolated_settings(directory)
+            if not options['with_cache']:
+                overrides['CACHES'] = DUMMY_CACHES
+            with override_settings(
+                **overrides
+            ), benchmark.temporary_database(directory):
+                profile = self.run(options)
+        self.report(profile, options['limit'])
+
+    def run(self, options):
+        benchmark.seed(SCALE)
+        urls, _ = benchmark.discover_urls()
+        clients = benchmark.make_clients()
+        # Первый проход разбирает шаблоны и в замер не входит.
+        for _, url in urls:
+            for client in clients.values():
+                benchmark.fetch(client, url)
+        with templating.profile_templates() as profile:
+            for _ in range(options['iterations']):
+                for _, url in urls:
+                    for client in clients.values():
+                        benchmark.fetch(client, url)
+        return profile
+
+    def report(self, profile, limit):
+        rows = profile.rows()
+        own_total = sum(row[3] for row in rows) or 1
+        self.stdout.write(
+            f'{"шаблон или тег":<48} {"рендеров":>9} {"всего, мс":>10} '
+            f'{"своё, мс":>10} {"доля":>6}'
+        )
+        for name, count, total, own in rows[:limit]:
+            self.stdout.write(
+                f'{name:<48} {count:>9} {total * 1000:>10.1f} '
+                f'{own * 1000:>10.1f} {own / own_total:>6.1%}'
+            )
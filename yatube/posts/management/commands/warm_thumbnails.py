@@ -0,0 +1,47 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Заранее создаёт все варианты миниатюр для картинок в media/posts/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=thumbnails.MAX_WORKERS,
+            help='Сколько картинок обрабатывать параллельно.'
+        )
+
+    def handle(self, *args, **options):
+        _, files = default_storage.listdir('posts')
+        names = [os.path.join('posts', name) for name in files]
+        started = time.monotonic()
+        failed = 0
+        for name, error in self.generate(names, options['workers']):
+            if error is not None:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {len(names) - failed} из {len(names)} '
+            f'за {time.monotonic() - started:.2f} с.'
+        ))
+
+    def generate(self, names, workers):
+        if workers <= 1:
+            for name in names:
+                yield name, self.safe_generate(name)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            yield from zip(names, pool.map(self.safe_generate, names))
+
+    def safe_generate(self, name):
+        try:
+            thumbnails.generate_variants(name)
+        except Exception as error:
+            return error
+        return None
@@ -0,0 +1,309 @@
+"""Лёгкие метрики запросов для продакшена.
+
+MetricsMiddleware для доли запросов POSTS_METRICS_SAMPLE_RATE собирает
+время ответа, число и время SQL-запросов, время рендеринга шаблонов,
+попадания и промахи кеша (posts.caching) и время создания миниатюр.
+Метрики копятся по имени view и отдаются в текстовом формате
+Prometheus на /metrics/ (персоналу или по POSTS_METRICS_TOKEN), а
+каждый замеренный запрос пишется в лог posts.metrics строкой JSON.
+
+При нулевой доле middleware отключается целиком (MiddlewareNotUsed),
+а точки замера в кеше, шаблонах и миниатюрах сводятся к чтению
+thread-local. Метрики живут в памяти процесса: при нескольких
+воркерах каждый отдаёт свои, складывает их Prometheus.
+"""
+import copy
+import hmac
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'yatube'
+# Границы гистограммы времени ответа, секунды.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Под этим именем копится работа фоновых потоков (миниатюры).
+BACKGROUND = 'background'
+UNRESOLVED = 'unresolved'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_local = threading.local()
+_lock = threading.Lock()
+_views = {}
+
+
+def sample_rate():
+    return getattr(settings, 'POSTS_METRICS_SAMPLE_RATE', 0)
+
+
+class Sample:
+    """Метрики одного запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.thumbnail_time = 0.0
+        self.cache = Counter()
+        self.template_depth = 0
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+class ViewMetrics:
+    """Накопленные метрики одного view."""
+
+    def __init__(self):
+        self.count = 0
+        self.buckets = [0] * len(BUCKETS)
+        self.duration = 0.0
+        self.statuses = Counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.thumbnail_time = 0.0
+        self.cache = Counter()
+
+    def add(self, sample, duration, status):
+        self.count += 1
+        self.duration += duration
+        for index, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                self.buckets[index] += 1
+        self.statuses[status] += 1
+        self.queries += sample.queries
+        self.db_time += sample.db_time
+        self.template_time += sample.template_time
+        self.thumbnail_time += sample.thumbnail_time
+        self.cache.update(sample.cache)
+
+
+def current():
+    return getattr(_local, 'sample', None)
+
+
+@contextmanager
+def collect():
+    """Собирать метрики текущего потока в новый Sample."""
+    sample = Sample()
+    with attach(sample), ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(sample.execute))
+        yield sample
+
+
+@contextmanager
+def attach(sample):
+    """Считать события кеша текущего потока в чужой Sample.
+
+    Для задач, которые запрос отдал в пул потоков (posts.concurrency).
+    """
+    previous = current()
+    _local.sample = sample
+    try:
+        yield sample
+    finally:
+        _local.sample = previous
+
+
+def record(view, sample, duration, status=None):
+    with _lock:
+        metrics = _views.get(view)
+        if metrics is None:
+            metrics = _views[view] = ViewMetrics()
+        metrics.add(sample, duration, status)
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+def count_cache(namespace, event):
+    sample = current()
+    if sample is not None:
+        sample.cache[namespace, event] += 1
+
+
+def time_template(render):
+    # Вложенные рендеры (include через render_to_string, дыры
+    # страницы) уже входят во время внешнего шаблона.
+    sample = current()
+    if sample is None or sample.template_depth:
+        return render()
+    sample.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return render()
+    finally:
+        sample.template_depth -= 1
+        sample.template_time += time.perf_counter() - started
+
+
+@contextmanager
+def thumbnail_timer():
+    """Засечь создание миниатюры: в запросе или в фоновом потоке."""
+    sample = current()
+    if sample is None and not sample_rate():
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if sample is not None:
+            sample.thumbnail_time += elapsed
+        else:
+            background = Sample()
+            background.thumbnail_time = elapsed
+            record(BACKGROUND, background, elapsed)
+
+
+def log_line(request, response, view, sample, duration):
+    return json.dumps({
+        'view': view,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 2),
+        'queries': sample.queries,
+        'db_ms': round(sample.db_time * 1000, 2),
+        'template_ms': round(sample.template_time * 1000, 2),
+        'thumbnail_ms': round(sample.thumbnail_time * 1000, 2),
+        'cache': {
+            f'{namespace}:{event}': total
+            for (namespace, event), total in sorted(sample.cache.items())
+        },
+    }, ensure_ascii=False)
+
+
+def finish(request, response, sample, duration):
+    match = request.resolver_match
+    view = match.view_name if match else UNRESOLVED
+    record(view, sample, duration, response.status_code)
+    logger.info(log_line(request, response, view, sample, duration))
+
+
+def _labels(**labels):
+    return ','.join(
+        f'{name}="{value}"' for name, value in labels.items()
+    )
+
+
+def render_prometheus():
+    with _lock:
+        views = {
+            view: copy.deepcopy(vars(metrics))
+            for view, metrics in _views.items()
+        }
+    lines = [
+        f'# HELP {PREFIX}_metrics_sample_rate Доля замеряемых запросов.',
+        f'# TYPE {PREFIX}_metrics_sample_rate gauge',
+        f'{PREFIX}_metrics_sample_rate {sample_rate()}',
+        f'# HELP {PREFIX}_request_duration_seconds Время ответа.',
+        f'# TYPE {PREFIX}_request_duration_seconds histogram',
+    ]
+    for view, metrics in sorted(views.items()):
+        for bound, total in zip(BUCKETS, metrics['buckets']):
+            lines.append(
+                f'{PREFIX}_request_duration_seconds_bucket'
+                f'{{{_labels(view=view, le=bound)}}} {total}'
+            )
+        lines += [
+            f'{PREFIX}_request_duration_seconds_bucket'
+            f'{{{_labels(view=view, le="+Inf")}}} {metrics["count"]}',
+            f'{PREFIX}_request_duration_seconds_sum'
+            f'{{{_labels(view=view)}}} {metrics["duration"]}',
+            f'{PREFIX}_request_duration_seconds_count'
+            f'{{{_labels(view=view)}}} {metrics["count"]}',
+        ]
+    lines += [
+        f'# HELP {PREFIX}_responses_total Ответы по кодам.',
+        f'# TYPE {PREFIX}_responses_total counter',
+    ]
+    for view, metrics in sorted(views.items()):
+        for status, total in sorted(metrics['statuses'].items(), key=str):
+            if status is not None:
+                lines.append(
+                    f'{PREFIX}_responses_total'
+                    f'{{{_labels(view=view, status=status)}}} {total}'
+                )
+    for name, field, help_text in (
+        ('db_queries_total', 'queries', 'SQL-запросы.'),
+        ('db_duration_seconds_total', 'db_time', 'Время SQL-запросов.'),
+        ('template_duration_seconds_total', 'template_time',
+         'Время рендеринга шаблонов.'),
+        ('thumbnail_duration_seconds_total', 'thumbnail_time',
+         'Время создания миниатюр.'),
+    ):
+        lines += [
+            f'# HELP {PREFIX}_{name} {help_text}',
+            f'# TYPE {PREFIX}_{name} counter',
+        ]
+        lines.extend(
+            f'{PREFIX}_{name}{{{_labels(view=view)}}} {metrics[field]}'
+            for view, metrics in sorted(views.items())
+        )
+    lines += [
+        f'# HELP {PREFIX}_cache_events_total События кеша posts.caching.',
+        f'# TYPE {PREFIX}_cache_events_total counter',
+    ]
+    for view, metrics in sorted(views.items()):
+        for (namespace, event), total in sorted(metrics['cache'].items()):
+            labels = _labels(view=view, namespace=namespace, event=event)
+            lines.append(f'{PREFIX}_cache_events_total{{{labels}}} {total}')
+    return '\n'.join(lines) + '\n'
+
+
+def _has_token(request):
+    # Адрес клиента за прокси ничего не говорит (у nginx он 127.0.0.1),
+    # поэтому сборщик предъявляет токен: bearer_token в Prometheus.
+    token = getattr(settings, 'POSTS_METRICS_TOKEN', '')
+    if not token:
+        return False
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return hmac.compare_digest(header, f'Bearer {token}')
+
+
+def export(request):
+    """Метрики для Prometheus: только для персонала и по токену."""
+    if not (request.user.is_staff or _has_token(request)):
+        raise Http404
+    return HttpResponse(render_prometheus(), content_type=CONTENT_TYPE)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        return time_template(
+            lambda: super(Template, self).render(context, request)
+        )
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд шаблонов Django с замером времени рендеринга."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -0,0 +1,54 @@
+import random
+import time
+
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics, profiling
+
+
+class MetricsMiddleware:
+    """Замер доли запросов, см. posts.metrics.
+
+    Ставится первым в MIDDLEWARE, чтобы в время ответа вошли и
+    остальные middleware.
+    """
+
+    def __init__(self, get_response):
+        self.rate = metrics.sample_rate()
+        if not self.rate:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self.rate < 1 and random.random() >= self.rate:
+            return self.get_response(request)
+        started = time.perf_counter()
+        with metrics.collect() as sample:
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        metrics.finish(request, response, sample, duration)
+        return response
+
+
+class SlowRequestMiddleware:
+    """Снимки медленных запросов к отдельным view, см. posts.profiling."""
+
+    def __init__(self, get_response):
+        self.views = set(profiling.watched_views())
+        if not self.views:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            capture = getattr(request, '_slow_capture', None)
+            if capture is not None:
+                profiling.finish(capture, request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.view_name in self.views:
+            request._slow_capture = profiling.start()
@@ -0,0 +1,84 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:14
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+FTS_TABLE = 'posts_post_fts'
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    return [
+        token
+        for token in TOKEN_RE.findall(text.lower().replace('ё', 'е'))
+        if len(token) <= 64
+    ]
+
+
+def fts5_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def create_index(apps, schema_editor):
+    """Создать FTS5-таблицу, если SQLite её поддерживает, и заполнить
+    тот индекс, которым будет пользоваться posts.search."""
+    connection = schema_editor.connection
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    posts = Post.objects.order_by().values_list('id', 'text')
+    if fts5_supported(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+                'text, tokenize="unicode61 remove_diacritics 0")'
+            )
+            for post_id, text in posts.iterator():
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                    [post_id, ' '.join(tokenize(text))]
+                )
+        return
+    SearchTerm.objects.bulk_create(
+        [
+            SearchTerm(term=term, post_id=post_id, count=count)
+            for post_id, text in posts.iterator()
+            for term, count in Counter(tokenize(text)).items()
+        ],
+        batch_size=500
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('count', models.PositiveIntegerField(default=1, verbose_name='Число вхождений')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post')),
+            ],
+            options={
+                'unique_together': {('term', 'post')},
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
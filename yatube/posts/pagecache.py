@@ -0,0 +1,154 @@
+"""Кеш целых страниц с «дырами» под пользовательские фрагменты.
+
+Страница рендерится один раз на набор меток свежести (см.
+posts.conditional), а всё, что зависит от пользователя, — шапка,
+кнопки подписки и правки, форма комментария — выводится тегом
+{% hole %}. При рендеринге для кеша тег оставляет маркер с именем
+шаблона и параметрами, и перед отдачей маркеры заполняются для
+текущего запроса. Анонимная версия кешируется уже заполненной,
+поэтому анонимный запрос обходится без кода view и без шаблонов.
+"""
+import base64
+import json
+import re
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from . import caching, conditional, writebuffer
+from .forms import CommentForm
+from .models import Follow
+
+PAGE_TIMEOUT = 10 * 60
+HOLE_RE = re.compile(r'<!--hole:([A-Za-z0-9_=-]+)-->')
+
+
+def follow_button_context(request, author_username):
+    # Подписка из буфера записи ещё может быть не в базе.
+    following = writebuffer.pending_following(request.user, author_username)
+    if following is None:
+        following = request.user.is_authenticated and Follow.objects.filter(
+            user=request.user, author__username=author_username
+        ).exists()
+    return {'following': following}
+
+
+def comment_form_context(request, post_id):
+    return {'form': CommentForm()}
+
+
+def pending_comments_context(request, post_id):
+    return {
+        'pending_comments': writebuffer.pending_comments(
+            request.user, post_id
+        ),
+    }
+
+
+# Дополнительный контекст дыр, которым мало параметров из тега.
+HOLE_CONTEXT = {
+    'posts/includes/follow_button.html': follow_button_context,
+    'posts/includes/comment_form.html': comment_form_context,
+    'posts/includes/pending_comments.html': pending_comments_context,
+}
+
+
+def render_hole(request, template_name, params):
+    context = dict(params)
+    extra = HOLE_CONTEXT.get(template_name)
+    if extra is not None:
+        context.update(extra(request, **params))
+    return render_to_string(template_name, context, request)
+
+
+def hole(request, template_name, params):
+    """Вывод тега {% hole %}: маркер при рендеринге для кеша."""
+    if not getattr(request, '_page_holes', False):
+        return render_hole(request, template_name, params)
+    data = json.dumps([template_name, params]).encode()
+    return f'<!--hole:{base64.urlsafe_b64encode(data).decode()}-->'
+
+
+def fill_holes(request, content):
+    def render(match):
+        template_name, params = json.loads(
+            base64.urlsafe_b64decode(match.group(1))
+        )
+        return render_hole(request, template_name, params)
+    return HOLE_RE.sub(render, content)
+
+
+def no_scopes(request, *args, **kwargs):
+    # Страница меняется только вместе со всем сайтом.
+    return []
+
+
+def _render_for_cache(request, view, args, kwargs):
+    request._page_holes = True
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+    finally:
+        request._page_holes = False
+    return response
+
+
+def _serve(request, values, view, args, kwargs):
+    path = request.get_full_path()
+    anonymous = not request.user.is_authenticated
+    anonymous_key = caching.make_key('page', path, *values, 'anonymous')
+    if anonymous:
+        cached = cache.get(anonymous_key)
+        if cached is not None:
+            caching._count('page', 'hit')
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+    key = caching.make_key('page', path, *values)
+    cached = cache.get(key)
+    if cached is not None:
+        caching._count('page', 'hit')
+    else:
+        caching._count('page', 'miss')
+        response = _render_for_cache(request, view, args, kwargs)
+        if response.streaming:
+            return response
+        content = response.content.decode(response.charset)
+        if response.status_code != 200:
+            response.content = fill_holes(request, content)
+            return response
+        cached = content, response['Content-Type']
+        cache.set(key, cached, PAGE_TIMEOUT)
+
+    content, content_type = cached
+    content = fill_holes(request, content)
+    # Токен CSRF свой у каждой сессии: такую страницу не делим.
+    if anonymous and not request.META.get('CSRF_COOKIE_USED'):
+        cache.set(anonymous_key, (content, content_type), PAGE_TIMEOUT)
+    return HttpResponse(content, content_type=content_type)
+
+
+def cached_page(scopes_func):
+    """fresh_when плюс кеш тела страницы с заполнением дыр.
+
+    scopes_func — как у conditional.fresh_when.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = scopes_func(request, *args, **kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+            values = conditional.stamps(conditional.SITE, *scopes)
+            return conditional.fresh_response(
+                request,
+                values,
+                lambda: _serve(request, values, view, args, kwargs)
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,178 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorEncoder(json.JSONEncoder):
+    # DjangoJSONEncoder обрезает микросекунды, а курсору нужна
+    # точная позиция, иначе записи с одной миллисекундой потеряются.
+    def default(self, o):
+        if hasattr(o, 'isoformat'):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по паре полей, например (pub_date, id).
+
+    В отличие от обычного Paginator не делает COUNT(*) и OFFSET:
+    каждая страница выбирается по индексу от позиции курсора,
+    поэтому её стоимость не зависит от глубины. API Paginator и Page
+    (count, num_pages, номер страницы) работает, но считает COUNT(*)
+    только когда его спросили; шаблон ленты курсором его не трогает.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = tuple(ordering)
+        self.fields = tuple(name.lstrip('-') for name in self.ordering)
+        self.descending = self.ordering[0].startswith('-')
+
+    @property
+    def model(self):
+        return self.object_list.model
+
+    def encode_cursor(self, obj, direction):
+        values = self.values(obj)
+        data = json.dumps([direction, values], cls=CursorEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode()
+            )
+            if direction not in (NEXT, PREVIOUS):
+                raise InvalidCursor(cursor)
+            model = self.model
+            values = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise InvalidCursor(cursor)
+        if len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _seek(self, values, forward, fields=None):
+        first, second = fields or self.fields
+        # Для убывающей сортировки «вперёд» означает «меньше».
+        lookup = 'lt' if forward == self.descending else 'gt'
+        return (
+            Q(**{f'{first}__{lookup}': values[0]})
+            | Q(**{first: values[0], f'{second}__{lookup}': values[1]})
+        )
+
+    def _ordering(self, forward, ordering=None):
+        ordering = ordering or self.ordering
+        if forward:
+            return list(ordering)
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in ordering
+        ]
+
+    def values(self, obj):
+        return [getattr(obj, name) for name in self.fields]
+
+    def count_before(self, obj):
+        """Сколько объектов в порядке пагинатора стоят перед obj."""
+        return self.object_list.filter(
+            self._seek(self.values(obj), forward=False)
+        ).count()
+
+    def fetch(self, values, forward, limit):
+        """Вернуть до limit объектов после (или до) позиции values."""
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        return list(queryset.order_by(*self._ordering(forward))[:limit])
+
+    def page(self, cursor=None):
+        direction, values = NEXT, None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        items = self.fetch(values, direction == NEXT, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if direction == PREVIOUS:
+            items.reverse()
+            return CursorPage(
+                items, self,
+                has_next=True, has_previous=has_more
+            )
+        return CursorPage(
+            items, self,
+            has_next=has_more, has_previous=bool(cursor)
+        )
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+class CursorPage(Page):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        # Без Page.__init__: номер страницы считается лениво (number).
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    @cached_property
+    def offset(self):
+        """Сколько объектов до страницы; один COUNT(*) по запросу."""
+        if not self.object_list:
+            return 0
+        return self.paginator.count_before(self.object_list[0])
+
+    @property
+    def number(self):
+        # Страница курсора может начинаться не с границы страниц
+        # постраничного режима: номер — та, где лежит её первый объект.
+        return self.offset // self.paginator.per_page + 1
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return self.offset + 1
+
+    def end_index(self):
+        return self.offset + len(self.object_list)
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], NEXT)
+
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], PREVIOUS)
@@ -0,0 +1,246 @@
+"""Снимки медленных запросов.
+
+Для view из POSTS_SLOW_REQUEST_VIEWS SlowRequestMiddleware пишет SQL
+запроса и раз в POSTS_SLOW_REQUEST_INTERVAL секунд снимает стек его
+потока (sys._current_frames() из общего потока-сэмплера). Если запрос
+уложился в POSTS_SLOW_REQUEST_THRESHOLD, всё собранное выбрасывается,
+иначе снимок пишется JSON-файлом в POSTS_SLOW_REQUEST_DIR; там
+хранятся только последние POSTS_SLOW_REQUEST_KEEP снимков.
+
+Сэмплер не инструментирует каждый вызов, как cProfile, поэтому
+почти не замедляет запрос и работает, только пока такие запросы идут.
+Снимки смотрят сотрудники на странице /slow-requests/.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connection
+from django.http import Http404
+from django.shortcuts import render
+
+DEFAULT_VIEWS = ('posts:post_detail', 'posts:follow_index')
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_INTERVAL = 0.005
+DEFAULT_KEEP = 100
+MAX_QUERIES = 1000
+MAX_DEPTH = 100
+TOP_FUNCTIONS = 30
+NAME_RE = re.compile(r'^[\w.-]+\.json$')
+
+
+def _setting(name, default):
+    return getattr(settings, f'POSTS_SLOW_REQUEST_{name}', default)
+
+
+def watched_views():
+    return _setting('VIEWS', DEFAULT_VIEWS)
+
+
+def directory():
+    return _setting(
+        'DIR', os.path.join(settings.BASE_DIR, 'slow_requests')
+    )
+
+
+class Capture:
+    """Стеки и SQL одного отслеживаемого запроса."""
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc)
+        self.stacks = Counter()
+        self.queries = []
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append(
+                    (sql, round((time.perf_counter() - started) * 1000, 3))
+                )
+
+    def sample(self, frame):
+        stack = []
+        while frame is not None and len(stack) < MAX_DEPTH:
+            code = frame.f_code
+            stack.append(
+                f'{code.co_name} ({code.co_filename}:{frame.f_lineno})'
+            )
+            frame = frame.f_back
+        self.stacks[tuple(reversed(stack))] += 1
+
+
+class Sampler:
+    """Общий поток, снимающий стеки отслеживаемых запросов."""
+
+    def __init__(self):
+        self.captures = {}
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def add(self, capture):
+        with self.condition:
+            self.captures[capture.thread_id] = capture
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='slow-requests', daemon=True
+                )
+                self.thread.start()
+            self.condition.notify()
+
+    def remove(self, capture):
+        with self.condition:
+            self.captures.pop(capture.thread_id, None)
+
+    def run(self):
+        interval = _setting('INTERVAL', DEFAULT_INTERVAL)
+        while True:
+            with self.condition:
+                while not self.captures:
+                    self.condition.wait()
+                captures = list(self.captures.values())
+            frames = sys._current_frames()
+            for capture in captures:
+                frame = frames.get(capture.thread_id)
+                if frame is not None:
+                    capture.sample(frame)
+            del frames
+            time.sleep(interval)
+
+
+_sampler = Sampler()
+
+
+def start():
+    capture = Capture(threading.get_ident())
+    connection.execute_wrappers.append(capture.execute)
+    _sampler.add(capture)
+    return capture
+
+
+def finish(capture, request, response):
+    """Остановить сбор и записать снимок, если запрос был медленным."""
+    duration = time.perf_counter() - capture.started
+    _sampler.remove(capture)
+    connection.execute_wrappers.remove(capture.execute)
+    if duration < _setting('THRESHOLD', DEFAULT_THRESHOLD):
+        return None
+    return save(snapshot(capture, request, response, duration))
+
+
+def snapshot(capture, request, response, duration):
+    return {
+        'view': request.resolver_match.view_name,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'user': request.user.get_username(),
+        'status': response and response.status_code,
+        'started': capture.started_at.isoformat(),
+        'duration_ms': round(duration * 1000, 1),
+        'interval_ms': _setting('INTERVAL', DEFAULT_INTERVAL) * 1000,
+        'stacks': [
+            [list(stack), count]
+            for stack, count in capture.stacks.most_common()
+        ],
+        'queries': capture.queries,
+    }
+
+
+def save(data):
+    path = directory()
+    os.makedirs(path, exist_ok=True)
+    started = data['started'][:26].replace(':', '-')
+    name = (
+        f'{started}-{data["view"].replace(":", "-")}-'
+        f'{int(data["duration_ms"])}ms.json'
+    )
+    with open(os.path.join(path, name), 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False)
+    rotate(path)
+    return name
+
+
+def rotate(path):
+    names = sorted(name for name in os.listdir(path) if NAME_RE.match(name))
+    for name in names[:-_setting('KEEP', DEFAULT_KEEP)]:
+        try:
+            os.remove(os.path.join(path, name))
+        except FileNotFoundError:
+            pass
+
+
+def snapshots():
+    path = directory()
+    if not os.path.isdir(path):
+        return []
+    return sorted(
+        (name for name in os.listdir(path) if NAME_RE.match(name)),
+        reverse=True
+    )
+
+
+def load(name):
+    if not NAME_RE.match(name):
+        raise Http404
+    try:
+        with open(os.path.join(directory(), name), encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        raise Http404
+
+
+def top_functions(stacks):
+    """Функции по числу снимков: собственных (лист) и всего (в стеке)."""
+    own = Counter()
+    total = Counter()
+    for stack, count in stacks:
+        if stack:
+            own[stack[-1]] += count
+        for function in set(stack):
+            total[function] += count
+    return [
+        (function, count, own[function])
+        for function, count in total.most_common(TOP_FUNCTIONS)
+    ]
+
+
+@staff_member_required
+def snapshot_list(request):
+    entries = []
+    for name in snapshots():
+        try:
+            entries.append((name, load(name)))
+        except Http404:
+            # Снимок удалила ротация, пока мы читали каталог.
+            continue
+    return render(
+        request, 'posts/slow_requests.html', {'snapshots': entries}
+    )
+
+
+@staff_member_required
+def snapshot_detail(request, name):
+    data = load(name)
+    samples = sum(count for stack, count in data['stacks'])
+    return render(request, 'posts/slow_request.html', {
+        'name': name,
+        'data': data,
+        'samples': samples,
+        'functions': top_functions(data['stacks']),
+        # Формат collapsed stacks для flamegraph.pl и speedscope.
+        'collapsed': '\n'.join(
+            f'{";".join(stack)} {count}' for stack, count in data['stacks']
+        ),
+        'db_ms': round(sum(ms for sql, ms in data['queries']), 1),
+    })
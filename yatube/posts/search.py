@@ -0,0 +1,246 @@
+"""Полнотекстовый поиск по постам.
+
+Индекс один из двух:
+- 'fts5' — виртуальная таблица SQLite FTS5, ранжирование bm25;
+- 'table' — инвертированный индекс в таблице SearchTerm,
+  ранжирование tf-idf; работает на любой базе.
+По умолчанию (POSTS_SEARCH_BACKEND = 'auto') используется FTS5, если
+миграция смогла создать её таблицу. Индекс обновляется сигналами Post,
+а пересобрать его целиком можно командой rebuild_search_index.
+
+В оба индекса попадает текст после tokenize(), поэтому слова
+сравниваются одинаково: без учёта регистра и с ё, равной е.
+Стемминга нет, вместо него слова запроса от PREFIX_MIN_LENGTH букв
+ищутся по префиксу: «туман» находит и «тумане».
+"""
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import (
+    Case, F, FloatField, IntegerField, Max, Q, Sum, When
+)
+
+from .models import Post, SearchTerm
+
+FTS_TABLE = f'{Post._meta.db_table}_fts'
+TOKEN_RE = re.compile(r'[^\W_]+')
+MAX_TERM_LENGTH = SearchTerm._meta.get_field('term').max_length
+MAX_QUERY_TERMS = 10
+PREFIX_MIN_LENGTH = 3
+BATCH_SIZE = 500
+
+_fts_available = None
+
+
+def tokenize(text):
+    return [
+        token
+        for token in TOKEN_RE.findall(text.lower().replace('ё', 'е'))
+        if len(token) <= MAX_TERM_LENGTH
+    ]
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def fts_available():
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available
+
+
+def backend():
+    name = getattr(settings, 'POSTS_SEARCH_BACKEND', 'auto')
+    if name == 'auto':
+        return 'fts5' if fts_available() else 'table'
+    return name
+
+
+def index_post(post):
+    """Добавить пост в индекс или обновить его запись."""
+    if backend() == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.id]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.id, ' '.join(tokenize(post.text))]
+            )
+        return
+    SearchTerm.objects.filter(post_id=post.id).delete()
+    SearchTerm.objects.bulk_create(_terms(post.id, post.text))
+
+
+def remove_post(post_id):
+    # Строки SearchTerm удаляет каскад, FTS5 о постах не знает.
+    if backend() == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+
+def _terms(post_id, text):
+    return [
+        SearchTerm(term=term, post_id=post_id, count=count)
+        for term, count in Counter(tokenize(text)).items()
+    ]
+
+
+def rebuild():
+    """Пересобрать индекс текущего бэкенда. Возвращает число постов."""
+    posts = Post.objects.order_by().values_list('id', 'text')
+    total = 0
+    if backend() == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            for post_id, text in posts.iterator(chunk_size=BATCH_SIZE):
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                    [post_id, ' '.join(tokenize(text))]
+                )
+                total += 1
+        return total
+    SearchTerm.objects.all().delete()
+    batch = []
+    for post_id, text in posts.iterator(chunk_size=BATCH_SIZE):
+        batch.extend(_terms(post_id, text))
+        total += 1
+        if len(batch) >= BATCH_SIZE:
+            SearchTerm.objects.bulk_create(batch)
+            batch = []
+    SearchTerm.objects.bulk_create(batch)
+    return total
+
+
+def _is_prefix(term):
+    return len(term) >= PREFIX_MIN_LENGTH
+
+
+def _match_expression(terms):
+    # Слова после tokenize() состоят из букв и цифр, кавычки безопасны.
+    return ' '.join(
+        f'"{term}"*' if _is_prefix(term) else f'"{term}"' for term in terms
+    )
+
+
+def _term_q(term):
+    if not _is_prefix(term):
+        return Q(term=term)
+    # Диапазон вместо LIKE, чтобы работал индекс по term.
+    return Q(term__gte=term, term__lt=term + '\uffff')
+
+
+def filter_queryset(queryset, query):
+    """Оставить в queryset постов только найденные, без ранжирования."""
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none()
+    if backend() == 'fts5':
+        return queryset.extra(
+            where=[
+                f'{Post._meta.db_table}.id IN (SELECT rowid FROM '
+                f'{FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'
+            ],
+            params=[_match_expression(terms)]
+        )
+    return queryset.filter(id__in=_term_matches(terms).values('post'))
+
+
+def _term_matches(terms):
+    # Пост должен содержать все слова запроса.
+    conditions = [_term_q(term) for term in terms]
+    any_term = Q()
+    for condition in conditions:
+        any_term |= condition
+    matched = sum(
+        Max(Case(
+            When(condition, then=1),
+            default=0,
+            output_field=IntegerField()
+        ))
+        for condition in conditions
+    )
+    return SearchTerm.objects.filter(any_term).values('post').annotate(
+        matched=matched
+    ).filter(matched=len(terms))
+
+
+class SearchResults:
+    """Ранжированные результаты поиска для Paginator.
+
+    Считает и выбирает только запрошенный срез; посты читаются
+    одним запросом for_feed() по найденным id.
+    """
+
+    def __init__(self, query):
+        self.terms = query_terms(query)
+        self.backend = backend()
+
+    def count(self):
+        if not self.terms:
+            return 0
+        if self.backend == 'fts5':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {FTS_TABLE} '
+                    f'WHERE {FTS_TABLE} MATCH %s',
+                    [_match_expression(self.terms)]
+                )
+                return cursor.fetchone()[0]
+        return _term_matches(self.terms).count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError('SearchResults поддерживает только срезы.')
+        if not self.terms:
+            return []
+        ids = self.ranked_ids(key.start or 0, key.stop)
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
+
+    def ranked_ids(self, start, stop):
+        if self.backend == 'fts5':
+            limit = -1 if stop is None else stop - start
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT rowid FROM {FTS_TABLE} '
+                    f'WHERE {FTS_TABLE} MATCH %s '
+                    f'ORDER BY rank, rowid DESC LIMIT %s OFFSET %s',
+                    [_match_expression(self.terms), limit, start]
+                )
+                return [row[0] for row in cursor.fetchall()]
+        return list(
+            _term_matches(self.terms).annotate(
+                score=self._tf_idf()
+            ).order_by('-score', '-post').values_list(
+                'post', flat=True
+            )[start:stop]
+        )
+
+    def _tf_idf(self):
+        total = Post.objects.count()
+        whens = []
+        for term in self.terms:
+            condition = _term_q(term)
+            posts = SearchTerm.objects.filter(condition).values(
+                'post'
+            ).distinct().count()
+            if posts:
+                whens.append(When(
+                    condition,
+                    then=F('count') * math.log(1 + total / posts)
+                ))
+        return Sum(Case(*whens, default=0, output_field=FloatField()))
@@ -0,0 +1,158 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from . import caching, conditional, counters, database, feeds, search
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+# Поля пользователя, которые выводятся в карточках и комментариях.
+USER_DISPLAY_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feeds.fan_out(instance)
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # Нужна прежняя группа, чтобы при переносе поста обновить обе.
+    instance._initial_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def touch_post_pages(sender, instance, **kwargs):
+    slugs = Group.objects.filter(
+        id__in={instance.group_id, instance._initial_group_id} - {None}
+    ).values_list('slug', flat=True)
+    conditional.touch(*conditional.post_scopes(
+        instance.id, instance.author.username, *slugs
+    ))
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'text' not in update_fields:
+        return
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def drop_post_fragments(sender, instance, **kwargs):
+    caching.invalidate_post(instance)
+
+
+# Счётчики ведутся по сигналам, чтобы записи и удаления из админки,
+# shell и каскадом считались так же, как из views. bulk_create и
+# массовые загрузки сигналов не шлют и обновляют счётчики сами.
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.post_added(instance)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.post_removed(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.comment_removed(instance)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.followed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.unfollowed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_post(instance.id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_posts(sender, instance, **kwargs):
+    # При удалении группы посты отвязываются через UPDATE без сигналов,
+    # поэтому ключи нужно собрать, пока связь ещё есть.
+    caching.invalidate_posts(instance.posts.all())
+    conditional.touch(conditional.SITE)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_fragments(sender, instance, created, update_fields=None,
+                              **kwargs):
+    if created:
+        return
+    if update_fields is not None and not (
+        USER_DISPLAY_FIELDS & set(update_fields)
+    ):
+        return
+    caching.invalidate_posts(instance.posts.all())
+    caching.invalidate_comments(
+        instance.comments.values_list('post_id', flat=True).distinct()
+    )
+    conditional.touch(conditional.SITE)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_comments(sender, instance, **kwargs):
+    caching.invalidate_comments([instance.post_id])
+    conditional.touch(conditional.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.user_id:
+        feeds.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_feed(sender, instance, **kwargs):
+    if instance.user_id:
+        feeds.remove(instance.user_id, instance.author_id)
+    feeds.demote(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def touch_follow_profiles(sender, instance, **kwargs):
+    # Счётчики подписок видны в профилях обоих пользователей.
+    usernames = User.objects.filter(
+        id__in={instance.user_id, instance.author_id} - {None}
+    ).values_list('username', flat=True)
+    conditional.touch(*map(conditional.author_scope, usernames))
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        database.configure_sqlite(connection)
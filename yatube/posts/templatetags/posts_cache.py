@@ -0,0 +1,86 @@
+from django import template
+from django.template.base import kwarg_re
+
+from posts import caching, pagecache
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return caching.get_or_compute(
+            'fragment',
+            caching.fragment_key(self.fragment_name, *vary_on),
+            lambda: self.nodelist.render(context)
+        )
+
+
+@register.tag
+def cachefragment(parser, token):
+    """Кешировать фрагмент через кеш-слой постов.
+
+    {% cachefragment post_card post.id post.updated 'feed' %}
+        ...
+    {% endcachefragment %}
+    """
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 2:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 1 argument.'
+        )
+    return FragmentNode(
+        nodelist,
+        tokens[1],
+        [parser.compile_filter(token) for token in tokens[2:]]
+    )
+
+
+class HoleNode(template.Node):
+    def __init__(self, template_name, params):
+        self.template_name = template_name
+        self.params = params
+
+    def render(self, context):
+        return pagecache.hole(
+            context['request'],
+            self.template_name.resolve(context),
+            {
+                name: value.resolve(context)
+                for name, value in self.params.items()
+            }
+        )
+
+
+@register.tag
+def hole(parser, token):
+    """Пользовательский фрагмент внутри закешированной страницы.
+
+    {% hole 'posts/includes/edit_link.html' post_id=post.id %}
+
+    Шаблон видит только переданные параметры (числа и строки),
+    пользователя и запрос, поэтому его можно отрисовать и поверх
+    закешированной страницы.
+    """
+    tokens = token.split_contents()
+    if len(tokens) < 2:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires a template name.'
+        )
+    params = {}
+    for bit in tokens[2:]:
+        match = kwarg_re.match(bit)
+        if not match or not match.group(1):
+            raise template.TemplateSyntaxError(
+                f'{tokens[0]!r} tag accepts only keyword arguments.'
+            )
+        name, value = match.groups()
+        params[name] = parser.compile_filter(value)
+    return HoleNode(parser.compile_filter(tokens[1]), params)
@@ -0,0 +1,33 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+# Карточка занимает всю ширину колонки, но не больше 960px.
+DEFAULT_SIZES = '(max-width: 992px) 100vw, 960px'
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(image, sizes=DEFAULT_SIZES):
+    """Адаптивная картинка поста: <picture> с вариантами по форматам.
+
+    {% post_picture post.image %}
+
+    Пока запасной JPEG не готов, выводится заглушка.
+    """
+    sources, fallback = [], None
+    for mime, format_, items in thumbnails.variants(image):
+        srcset = ', '.join(
+            f'{thumbnail.url} {width}w' for thumbnail, width in items
+        )
+        if format_ == thumbnails.FALLBACK_FORMAT:
+            fallback = {'srcset': srcset, 'src': items[-1][0].url}
+        else:
+            sources.append({'type': mime, 'srcset': srcset})
+    return {
+        'image': image,
+        'sources': sources,
+        'fallback': fallback,
+        'sizes': sizes,
+    }
@@ -0,0 +1,195 @@
+"""Предкомпиляция шаблонов и замер времени их рендеринга.
+
+С кешированным загрузчиком (settings.POSTS_TEMPLATE_CACHE) каждый
+шаблон разбирается один раз на процесс. precompile() разбирает все
+шаблоны сразу: при старте воркера (yatube.wsgi) первый запрос к
+странице не платит за разбор цепочки base.html → header.html → …, а
+команда compile_templates заодно находит синтаксические ошибки до
+выкладки.
+
+RenderProfile считает время каждого шаблона, включая подключённые
+через {% include %}, {% extends %} и inclusion-теги, и время
+собственных тегов (миниатюры, картинки постов). Он подменяет методы
+движка шаблонов на время замера, поэтому нужен только командам
+вроде template_report, а не продакшену.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.template import TemplateSyntaxError, engines
+from django.template import base
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders import cached
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = ('.html', '.txt')
+
+_local = threading.local()
+
+
+def django_engines():
+    return [
+        backend.engine for backend in engines.all()
+        if isinstance(backend, DjangoTemplates)
+    ]
+
+
+def uses_cached_loader(engine):
+    return any(
+        isinstance(loader, cached.Loader) for loader in engine.template_loaders
+    )
+
+
+def _loader_dirs(loader):
+    # Кешированный загрузчик своих каталогов не знает, спрашиваем
+    # вложенные.
+    for nested in getattr(loader, 'loaders', ()):
+        yield from _loader_dirs(nested)
+    if hasattr(loader, 'get_dirs'):
+        yield from loader.get_dirs()
+
+
+def template_names(engine):
+    """Имена всех шаблонов, которые видят загрузчики движка."""
+    names = []
+    for loader in engine.template_loaders:
+        for directory in _loader_dirs(loader):
+            for root, _, files in os.walk(directory):
+                for file_name in files:
+                    if file_name.endswith(EXTENSIONS):
+                        path = os.path.join(root, file_name)
+                        names.append(os.path.relpath(path, directory))
+    # Одноимённый шаблон из более раннего каталога перекрывает
+    # остальные, загрузится всё равно он.
+    return list(dict.fromkeys(
+        name.replace(os.sep, '/') for name in names
+    ))
+
+
+def precompile():
+    """Разобрать все шаблоны; вернуть (число шаблонов, ошибки).
+
+    Ошибки — пары (имя шаблона, исключение).
+    """
+    count, errors = 0, []
+    for engine in django_engines():
+        for name in template_names(engine):
+            count += 1
+            try:
+                engine.get_template(name)
+            except (TemplateSyntaxError, UnicodeDecodeError) as error:
+                errors.append((name, error))
+    return count, errors
+
+
+def warm_up():
+    """Предкомпиляция при старте воркера, если шаблоны кешируются."""
+    if not any(uses_cached_loader(e) for e in django_engines()):
+        return
+    count, errors = precompile()
+    for name, error in errors:
+        logger.error('Шаблон %s не разбирается: %s', name, error)
+    logger.info('Предкомпилировано шаблонов: %s', count)
+
+
+class RenderStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        # Без вложенных шаблонов и тегов.
+        self.own = 0.0
+
+
+class RenderProfile:
+    """Время рендеринга по шаблонам и собственным тегам."""
+
+    def __init__(self):
+        self.templates = {}
+        self.tags = {}
+        # Время вложенных замеров для каждого открытого замера.
+        self._nested = []
+
+    def time_template(self, template, render):
+        return self._time(
+            self.templates, template.name or '<строка>', render
+        )
+
+    def time_tag(self, name, render):
+        return self._time(self.tags, name, render)
+
+    def _time(self, table, name, render):
+        self._nested.append(0.0)
+        started = time.perf_counter()
+        try:
+            return render()
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            stats = table.get(name)
+            if stats is None:
+                stats = table[name] = RenderStats()
+            stats.count += 1
+            stats.total += elapsed
+            stats.own += elapsed - nested
+
+    def rows(self):
+        """(имя, рендеров, всего, собственное время) от дорогих к дешёвым."""
+        rows = [
+            (name, stats.count, stats.total, stats.own)
+            for table in (self.templates, self.tags)
+            for name, stats in table.items()
+        ]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+
+def _tag_name(node):
+    # Встроенные теги Django не замеряются; simple_tag и inclusion_tag
+    # тоже узлы django.template.library, их узнаём по func.
+    builtin = type(node).__module__.startswith('django.')
+    if builtin and not hasattr(node, 'func'):
+        return None
+    token = getattr(node, 'token', None)
+    if token is None:
+        return type(node).__name__
+    return f'{{% {token.contents.split()[0]} %}}'
+
+
+@contextmanager
+def profile_templates():
+    """Собирать RenderProfile, пока открыт контекст (текущий поток)."""
+    profile = RenderProfile()
+    render = base.Template._render
+    render_annotated = base.Node.render_annotated
+
+    def timed_render(template, context):
+        current = getattr(_local, 'profile', None)
+        if current is None:
+            return render(template, context)
+        return current.time_template(
+            template, lambda: render(template, context)
+        )
+
+    def timed_render_annotated(node, context):
+        current = getattr(_local, 'profile', None)
+        name = current and _tag_name(node)
+        if not name:
+            return render_annotated(node, context)
+        return current.time_tag(
+            name, lambda: render_annotated(node, context)
+        )
+
+    _local.profile = profile
+    base.Template._render = timed_render
+    base.Node.render_annotated = timed_render_annotated
+    try:
+        yield profile
+    finally:
+        base.Template._render = render
+        base.Node.render_annotated = render_annotated
+        _local.profile = None
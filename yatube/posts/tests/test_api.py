@@ -0,0 +1,135 @@
+from unittest.mock import patch
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import POSTS_PER_PAGE
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='auth', first_name='Лев')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=f'Пост {number}')
+            for number in range(POSTS_PER_PAGE + 3)
+        )
+        cls.post = Post.objects.latest('pub_date', 'id')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_page_by_cursor(self):
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group', args=(self.group.slug,)),
+            reverse('posts:api_profile', args=(self.user.username,)),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), POSTS_PER_PAGE)
+                self.assertEqual(data['results'][0]['id'], self.post.id)
+                self.assertEqual(
+                    data['results'][0]['author']['full_name'], 'Лев'
+                )
+                self.assertIsNone(data['previous'])
+                data = self.client.get(data['next']).json()
+                self.assertEqual(len(data['results']), 3)
+                self.assertIsNone(data['next'])
+
+    def test_profile_includes_counters(self):
+        data = self.client.get(
+            reverse('posts:api_profile', args=(self.user.username,))
+        ).json()
+        self.assertEqual(data['author']['username'], self.user.username)
+        self.assertIn('posts_count', data['author'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse('posts:api_index'), {'cursor': 'broken'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_unchanged_feed_returns_304(self):
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.post.text = 'Изменённый пост'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_detail_with_comments(self):
+        url = reverse('posts:api_post', args=(self.post.id,))
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['post']['id'], self.post.id)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Комментарий']
+        )
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_unchanged_post_detail_does_not_scan_comments(self):
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.reader, text=f'К {number}')
+            for number in range(3)
+        )
+        url = reverse('posts:api_post', args=(self.post.id,))
+        etag = self.client.get(url)['ETag']
+        # Пост с автором и группой и время последнего комментария.
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_comments_page_by_cursor(self):
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.reader, text=f'К {number}')
+            for number in range(3)
+        )
+        with patch('posts.utils.COMMENTS_PER_PAGE', 2):
+            data = self.client.get(
+                reverse('posts:api_post', args=(self.post.id,))
+            ).json()
+            self.assertEqual(len(data['comments']), 2)
+            data = self.client.get(data['comments_next']).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['results']], ['К 2']
+        )
+        self.assertIsNone(data['next'])
+
+    def test_follow_feed(self):
+        url = reverse('posts:api_follow')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.reader_client.get(url)
+        self.assertEqual(len(response.json()['results']), POSTS_PER_PAGE)
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_read_only(self):
+        response = self.client.post(reverse('posts:api_index'))
+        self.assertEqual(response.status_code, 405)
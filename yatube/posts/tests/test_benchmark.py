@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import TestCase
+
+from posts import benchmark
+from posts.models import Comment, FeedEntry, Follow, Post
+from posts.urls import urlpatterns
+
+SCALE = {
+    'users': 5,
+    'groups': 2,
+    'posts': 30,
+    'comments': 20,
+    'follows': 6,
+}
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.scale = benchmark.seed(SCALE)
+
+    def test_seed_creates_data(self):
+        self.assertEqual(self.scale, SCALE)
+        self.assertEqual(Post.objects.count(), SCALE['posts'])
+        self.assertEqual(Comment.objects.count(), SCALE['comments'])
+        self.assertEqual(Follow.objects.count(), SCALE['follows'])
+        self.assertTrue(FeedEntry.objects.exists())
+        # Даты разные, а счётчики пересчитаны.
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1
+        )
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)),
+            SCALE['comments']
+        )
+
+    def test_every_url_is_measured(self):
+        urls, skipped = benchmark.discover_urls()
+        # Подписки меняют данные, а снимков медленных запросов в
+        # свежей базе нет.
+        self.assertEqual(
+            skipped, ['profile_follow', 'profile_unfollow', 'slow_request']
+        )
+        self.assertEqual(
+            sorted([name for name, url in urls] + skipped),
+            sorted(pattern.name for pattern in urlpatterns)
+        )
+        results = benchmark.measure(
+            urls[:2], benchmark.make_clients(), iterations=3, warmup=1
+        )
+        self.assertEqual(len(results), 4)
+        for result in results.values():
+            self.assertEqual(result['status'], 200)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['alloc_kib'], 0)
+
+    def test_streaming_response_is_read_in_measurement(self):
+        chunks = []
+
+        def content():
+            for number in range(3):
+                chunks.append(number)
+                yield b'chunk'
+
+        client = mock.Mock()
+        client.get.side_effect = lambda url: StreamingHttpResponse(content())
+        benchmark.measure_url(client, '/export/', iterations=2, warmup=1)
+        # Прогрев, замеры и замер памяти прочитали ответ целиком.
+        self.assertEqual(len(chunks), 3 * 4)
+
+    def test_error_responses_are_regressions(self):
+        client = mock.Mock()
+        client.get.return_value = HttpResponse(status=500)
+        result = benchmark.measure_url(client, '/', iterations=3, warmup=0)
+        self.assertEqual(result['errors'], 3)
+        baseline = {'index user': dict(result, errors=0)}
+        self.assertEqual(
+            benchmark.compare({'index user': result}, baseline),
+            ['index user: errors 0 -> 3']
+        )
+
+    def test_compare(self):
+        baseline = {
+            'index user': {'p50_ms': 10, 'queries': 3, 'alloc_kib': 100},
+        }
+        same = {
+            'index user': {'p50_ms': 11, 'queries': 3, 'alloc_kib': 110},
+            'new user': {'p50_ms': 50, 'queries': 9, 'alloc_kib': 500},
+        }
+        self.assertEqual(benchmark.compare(same, baseline), [])
+        worse = {
+            'index user': {'p50_ms': 20, 'queries': 4, 'alloc_kib': 200},
+        }
+        self.assertEqual(len(benchmark.compare(worse, baseline)), 3)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 99), 7)
@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from posts import caching
+from posts.backends import filecache
+from posts.backends.filecache import FileBasedCache
+
+
+class CachingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        caching.reset_stats()
+        self.key = caching.make_key('fragment', 'test', 1)
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'value {self.calls}'
+
+    def get(self, timeout=caching.DEFAULT_TIMEOUT):
+        return caching.get_or_compute(
+            'fragment', self.key, self.compute, timeout
+        )
+
+    def test_keys_are_namespaced_and_versioned(self):
+        self.assertTrue(self.key.startswith('posts:fragment:v1:'))
+        self.assertNotEqual(self.key, caching.make_key('fragment', 'test', 2))
+        with mock.patch.dict(caching.NAMESPACE_VERSIONS, {'fragment': 2}):
+            self.assertNotEqual(
+                self.key, caching.make_key('fragment', 'test', 1)
+            )
+
+    def test_value_is_computed_once(self):
+        self.assertEqual(self.get(), 'value 1')
+        self.assertEqual(self.get(), 'value 1')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(caching.stats(), {
+            ('fragment', 'miss'): 1,
+            ('fragment', 'hit'): 1,
+        })
+
+    def test_expired_value_is_recomputed_by_lock_holder_only(self):
+        self.get()
+        value, expires_at, delta = cache.get(self.key)
+        cache.set(self.key, (value, time.time() - 1, delta))
+        # Блокировку держит другой воркер — отдаём устаревшее значение.
+        cache.add(caching._lock_key(self.key), 1)
+        self.assertEqual(self.get(), 'value 1')
+        self.assertEqual(self.calls, 1)
+        cache.delete(caching._lock_key(self.key))
+        self.assertEqual(self.get(), 'value 2')
+        self.assertEqual(caching.stats()[('fragment', 'stale')], 1)
+        self.assertEqual(caching.stats()[('fragment', 'recompute')], 1)
+
+    def test_early_recompute_near_expiry(self):
+        self.get()
+        value, expires_at, delta = cache.get(self.key)
+        cache.set(self.key, (value, time.time() + 0.5, 1))
+        with mock.patch('posts.caching.random.random', return_value=0.99):
+            self.assertEqual(self.get(), 'value 2')
+        with mock.patch('posts.caching.random.random', return_value=0.0):
+            self.assertEqual(self.get(), 'value 2')
+
+    def test_miss_waits_for_other_worker(self):
+        cache.add(caching._lock_key(self.key), 1)
+        with mock.patch.object(caching, 'LOCK_WAIT', 0.01):
+            self.assertEqual(self.get(), 'value 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_foreign_lock_is_not_released(self):
+        lock = caching._lock_key(self.key)
+
+        def compute():
+            # Наша блокировка истекла, её взял другой воркер.
+            cache.set(lock, 'other')
+            return 'value'
+
+        caching.get_or_compute('fragment', self.key, compute)
+        self.assertEqual(cache.get(lock), 'other')
+        cache.delete(lock)
+        self.get()
+        self.assertIsNone(cache.get(lock))
+
+
+class FileCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def make_cache(self):
+        return FileBasedCache(self.directory, {'OPTIONS': {'MAX_ENTRIES': 5}})
+
+    def test_add_does_not_overwrite_live_entry(self):
+        file_cache = self.make_cache()
+        self.assertTrue(file_cache.add('lock', 1, 10))
+        self.assertFalse(file_cache.add('lock', 2, 10))
+        self.assertEqual(file_cache.get('lock'), 1)
+
+    def test_add_replaces_expired_entry(self):
+        file_cache = self.make_cache()
+        file_cache.set('lock', 1, 10)
+        with mock.patch('time.time', return_value=time.time() + 60):
+            self.assertTrue(file_cache.add('lock', 2, 10))
+            self.assertEqual(file_cache.get('lock'), 2)
+
+    def test_concurrent_add_succeeds_once(self):
+        results = []
+        barrier = threading.Barrier(8)
+
+        def take():
+            file_cache = self.make_cache()
+            barrier.wait()
+            results.append(file_cache.add('lock', 1, 10))
+
+        threads = [threading.Thread(target=take) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 1)
+
+    def test_add_is_refused_while_locked_unless_lock_is_stale(self):
+        file_cache = self.make_cache()
+        lock = file_cache._key_to_file('lock') + '.lock'
+        open(lock, 'w').close()
+        # Другой воркер как раз добавляет запись.
+        self.assertFalse(file_cache.add('lock', 1, 10))
+        stale = time.time() - filecache.LOCK_STALE - 1
+        os.utime(lock, (stale, stale))
+        self.assertTrue(file_cache.add('lock', 1, 10))
+        self.assertFalse(os.path.exists(lock))
+
+    def test_directory_is_listed_once_per_interval(self):
+        file_cache = self.make_cache()
+        with mock.patch.object(
+            file_cache, '_list_cache_files', return_value=[]
+        ) as listing:
+            for number in range(10):
+                file_cache.set(f'key {number}', number)
+        self.assertEqual(listing.call_count, 1)
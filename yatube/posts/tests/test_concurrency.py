@@ -0,0 +1,75 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts import concurrency, metrics
+from posts.models import Follow, Post, User
+
+
+@override_settings(POSTS_QUERY_THREADS=2)
+class GatherTest(TransactionTestCase):
+    # Пул работает только вне транзакции, поэтому без обёртки TestCase.
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Post.objects.create(author=self.author, text='Пост автора')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_calls_run_in_pool(self):
+        first, second = concurrency.gather(
+            threading.get_ident, threading.get_ident
+        )
+        self.assertEqual(first, threading.get_ident())
+        self.assertNotEqual(second, first)
+        with transaction.atomic():
+            self.assertEqual(
+                len(set(concurrency.gather(
+                    threading.get_ident, threading.get_ident
+                ))), 1
+            )
+
+    def test_error_is_raised_after_all_calls(self):
+        finished = []
+        with self.assertRaises(Http404):
+            concurrency.gather(
+                lambda: finished.append('first'),
+                lambda: get_object_or_404(User, username='nobody'),
+                lambda: finished.append('third')
+            )
+        self.assertCountEqual(finished, ['first', 'third'])
+
+    def test_pool_connections_follow_conn_max_age(self):
+        with mock.patch(
+            'posts.concurrency.close_old_connections'
+        ) as close_old_connections:
+            concurrency.gather(lambda: None, lambda: None)
+        # До и после задачи пула, как на границах запроса.
+        self.assertEqual(close_old_connections.call_count, 2)
+
+    def test_pool_queries_are_measured(self):
+        with metrics.collect() as sample:
+            concurrency.gather(
+                lambda: Post.objects.exists(),
+                lambda: User.objects.count()
+            )
+        self.assertEqual(sample.queries, 2)
+
+    def test_profile(self):
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+        self.assertEqual(response.context['author'], self.author)
+        self.assertTrue(response.context['following'])
+        self.assertContains(response, 'Пост автора')
+        response = client.get(reverse('posts:profile', args=('nobody',)))
+        self.assertEqual(response.status_code, 404)
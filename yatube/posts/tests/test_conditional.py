@@ -0,0 +1,146 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import conditional
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.utils import OnCommitMixin
+
+
+class ConditionalPagesTest(OnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='auth')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text='Тестовый пост'
+        )
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def assertRevalidates(self, url, change, client=None):
+        client = client or self.client
+        etag = client.get(url)['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_pages_return_304(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.id,)),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                with self.assertNumQueries(0 if 'posts/' not in url else 1):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_new_post_refreshes_group_and_profile(self):
+        def create():
+            Post.objects.create(
+                author=self.user, group=self.group, text='Новый пост'
+            )
+        self.assertRevalidates(
+            reverse('posts:group_list', args=(self.group.slug,)), create
+        )
+        self.assertRevalidates(
+            reverse('posts:profile', args=(self.user.username,)), create
+        )
+
+    def test_moving_post_refreshes_old_group(self):
+        def move():
+            post = Post.objects.get(id=self.post.id)
+            post.group = self.other_group
+            post.save()
+        self.assertRevalidates(
+            reverse('posts:group_list', args=(self.group.slug,)), move
+        )
+
+    def test_comment_refreshes_post_detail(self):
+        self.assertRevalidates(
+            reverse('posts:post_detail', args=(self.post.id,)),
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            )
+        )
+
+    def test_follow_refreshes_profile(self):
+        self.assertRevalidates(
+            reverse('posts:profile', args=(self.user.username,)),
+            lambda: Follow.objects.create(user=self.reader, author=self.user),
+            client=self.reader_client
+        )
+
+    def test_stamps_change_again_after_commit(self):
+        scope = conditional.post_scope(self.post.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            )
+        # Страницу, закешированную до фиксации под этой меткой, после
+        # фиксации уже не отдадут.
+        [during] = conditional.stamps(scope)
+        with mock.patch('time.time', return_value=during + 1):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(conditional.stamps(scope), [during + 1])
+
+    def test_other_group_stays_fresh(self):
+        url = reverse('posts:group_list', args=(self.other_group.slug,))
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.user, group=self.group, text='Пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_user(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_cache_control(self):
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertIn('Cookie', response['Vary'])
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn(
+            f's-maxage={conditional.PUBLIC_MAX_AGE}',
+            response['Cache-Control']
+        )
+        response = self.reader_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_missing_object_is_not_cached(self):
+        response = self.client.get(
+            reverse('posts:group_list', args=('missing',))
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Cache-Control'))
@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, User, UserStats
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='auth')
+        cls.author = User.objects.create(username='author')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_create_counts_posts(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Новый пост'}
+        )
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+
+    def test_add_comment_counts_comments(self):
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        for _ in range(2):
+            self.authorized_client.post(
+                reverse('posts:add_comment', kwargs={'post_id': post.id}),
+                data={'text': 'Новый комментарий'}
+            )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+
+    def test_follow_and_unfollow_count_once(self):
+        follow = reverse('posts:profile_follow', kwargs={'username': 'author'})
+        unfollow = reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author'}
+        )
+        self.authorized_client.get(follow)
+        self.authorized_client.get(follow)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.authorized_client.get(unfollow)
+        self.authorized_client.get(unfollow)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+
+    def test_recount_fixes_drift(self):
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        Follow.objects.create(user=self.user, author=self.author)
+        UserStats.objects.filter(user=self.user).delete()
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        call_command('recount', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+
+    def test_deletes_outside_views_are_counted(self):
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        Post.objects.create(author=self.author, text='Второй пост')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Текст'
+        )
+        Comment.objects.create(post=post, author=self.user, text='Ещё')
+        Follow.objects.create(user=self.user, author=self.author)
+        call_command('recount', stdout=StringIO())
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Follow.objects.filter(user=self.user).delete()
+        self.assertEqual(self.stats(self.user).following_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+    def test_deleting_author_updates_followers(self):
+        writer = User.objects.create(username='writer')
+        Follow.objects.create(user=self.user, author=writer)
+        Post.objects.create(author=writer, text='Пост автора')
+        writer.delete()
+        self.assertFalse(UserStats.objects.filter(user_id=writer.id).exists())
+        self.assertEqual(self.stats(self.user).following_count, 0)
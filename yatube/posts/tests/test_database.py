@@ -0,0 +1,40 @@
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts import database
+
+
+class SqliteTest(TransactionTestCase):
+    # Прагмы synchronous и journal_mode не меняются внутри транзакции,
+    # поэтому тесты идут без обёртки TestCase.
+
+    def test_pragmas_applied(self):
+        with override_settings(POSTS_SQLITE_PRAGMAS={
+            'synchronous': 'normal', 'busy_timeout': 1234
+        }):
+            self.assertEqual(
+                [name for name, value in database.sqlite_pragmas()],
+                ['busy_timeout', 'synchronous']
+            )
+            # Тестовая база в памяти не переоткрывается: вызываем сами.
+            database.configure_sqlite(connection)
+            self.assertEqual(
+                database.current_pragmas(connection),
+                {'busy_timeout': 1234, 'synchronous': 1}
+            )
+
+    def test_invalid_pragma(self):
+        with override_settings(POSTS_SQLITE_PRAGMAS={
+            'synchronous': 'off; DROP TABLE posts_post'
+        }):
+            with self.assertRaises(ValueError):
+                database.configure_sqlite(connection)
+
+    def test_transactions_take_write_lock(self):
+        with CaptureQueriesContext(connection) as captured:
+            with transaction.atomic():
+                pass
+        self.assertEqual(
+            captured.captured_queries[0]['sql'], 'BEGIN IMMEDIATE'
+        )
@@ -0,0 +1,141 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def jsonl(content):
+    return [json.loads(line) for line in content.splitlines()]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.admin = User.objects.create_user(username='admin', is_staff=True)
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif')
+        )
+        Post.objects.create(author=cls.reader, text='Чужой пост')
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Свой комментарий'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Чужой комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def download(self, url, client=None):
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_user_file(self):
+        response, content = self.download(reverse(
+            'posts:export_file', kwargs={'kind': 'posts', 'format': 'jsonl'}
+        ))
+        self.assertIn('attachment', response['Content-Disposition'])
+        [record] = jsonl(content.decode())
+        self.assertEqual(record['id'], self.post.id)
+        self.assertEqual(record['author'], 'author')
+        self.assertEqual(record['group'], '')
+        self.assertEqual(record['image'], self.post.image.name)
+
+        response, content = self.download(reverse(
+            'posts:export_file', kwargs={'kind': 'comments', 'format': 'csv'}
+        ))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        [row] = csv.DictReader(StringIO(content.decode()))
+        self.assertEqual(row['text'], 'Свой комментарий')
+        self.assertEqual(row['post'], str(self.post.id))
+
+    def test_unknown_kind_or_format(self):
+        for kind, format in (('follows', 'csv'), ('posts', 'xml')):
+            with self.subTest(kind=kind, format=format):
+                response = self.client.get(reverse(
+                    'posts:export_file',
+                    kwargs={'kind': kind, 'format': format}
+                ))
+                self.assertEqual(response.status_code, 404)
+
+    def test_user_archive(self):
+        response, content = self.download(reverse('posts:export'))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertEqual(archive.namelist(), [
+                'posts.jsonl', 'comments.jsonl', self.post.image.name
+            ])
+            self.assertEqual(archive.read(self.post.image.name), SMALL_GIF)
+            self.assertEqual(
+                len(jsonl(archive.read('comments.jsonl').decode())), 1
+            )
+
+    def test_site_archive_is_staff_only(self):
+        url = reverse('posts:export_site')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        admin = Client()
+        admin.force_login(self.admin)
+        response, content = self.download(url, admin)
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertEqual(
+                jsonl(archive.read('follows.jsonl').decode()),
+                [{'user': 'reader', 'author': 'author'}]
+            )
+            self.assertEqual(
+                len(jsonl(archive.read('posts.jsonl').decode())), 2
+            )
+
+    def test_command_output_imports_back(self):
+        path = os.path.join(TEMP_MEDIA_ROOT, 'comments.jsonl')
+        out = StringIO()
+        call_command(
+            'export_data', path, '--format', 'jsonl', '--kind', 'comments',
+            stdout=out
+        )
+        self.assertIn('Записано', out.getvalue())
+        Comment.objects.all().delete()
+        call_command(
+            'import_data', 'comment', path, '--skip-derived', stdout=out
+        )
+        self.assertEqual(
+            sorted(Comment.objects.values_list('text', flat=True)),
+            ['Свой комментарий', 'Чужой комментарий']
+        )
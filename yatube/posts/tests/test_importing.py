@@ -0,0 +1,188 @@
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from posts import importing, search
+from posts.models import FeedEntry, Follow, Group, Post, User, UserStats
+
+TEMP_DIR = os.path.join(settings.BASE_DIR, 'tmp_import')
+
+
+def write(name, content):
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    path = os.path.join(TEMP_DIR, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(content)
+    return path
+
+
+def jsonl(*records):
+    return ''.join(
+        json.dumps(record, ensure_ascii=False) + '\n' for record in records
+    )
+
+
+def run(*args):
+    out = StringIO()
+    err = StringIO()
+    call_command('import_data', *args, stdout=out, stderr=err)
+    return out.getvalue(), err.getvalue()
+
+
+class ImportDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_import_posts_comments_follows(self):
+        posts = write('posts.jsonl', jsonl(
+            {
+                'id': 100,
+                'text': 'Туман над рекой',
+                'author': 'author',
+                'group': 'test-slug',
+                'pub_date': '2020-05-01T10:00:00',
+            },
+            {'text': 'Второй пост', 'author': 'author'},
+            {'text': 'Без автора'},
+            {'text': 'Чужой', 'author': 'nobody'},
+        ) + 'не json\n')
+        out, err = run('post', posts, '--batch-size', '2')
+        self.assertIn('Импортировано записей: 2, с ошибками: 3', out)
+        self.assertIn('нет поля author', err)
+        post = Post.objects.get(id=100)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(
+            post.pub_date, datetime(2020, 5, 1, 10, tzinfo=timezone.utc)
+        )
+        self.assertEqual(post.updated, post.pub_date)
+        self.assertEqual(search.SearchResults('туман').count(), 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 2
+        )
+
+        comments = write('comments.csv', (
+            'post,author,text,created\n'
+            '100,reader,Первый,2020-05-02T10:00:00\n'
+            '100,reader,Второй,\n'
+            'x,reader,Битый,\n'
+        ))
+        out, err = run('comment', comments)
+        self.assertIn('Импортировано записей: 2, с ошибками: 1', out)
+        self.assertEqual(Post.objects.get(id=100).comments_count, 2)
+
+        follows = write('follows.jsonl', jsonl(
+            {'user': 'reader', 'author': 'author'},
+            {'user': 'reader', 'author': 'author'},
+            {'user': 'author', 'author': 'author'},
+        ))
+        out, err = run('follow', follows)
+        self.assertIn('подписка на самого себя', err)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 2
+        )
+
+        # Новые посты получают id после импортированных явно.
+        self.assertGreater(
+            Post.objects.create(text='Новый', author=self.author).id, 100
+        )
+
+    def test_rejected_batch_is_written_row_by_row(self):
+        Post.objects.create(id=50, text='Уже есть', author=self.author)
+        posts = write('taken.jsonl', jsonl(
+            {'id': 50, 'text': 'Занятый id', 'author': 'author'},
+            {'id': 51, 'text': 'Первый', 'author': 'author'},
+            {'id': 51, 'text': 'Повтор', 'author': 'author'},
+            {'id': 52, 'text': 'Второй', 'author': 'author'},
+        ))
+        out, err = run('post', posts, '--skip-derived')
+        self.assertIn('Импортировано записей: 2, с ошибками: 2', out)
+        self.assertIn('Занятый id', err)
+        self.assertIn('Повтор', err)
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('text', flat=True)),
+            ['Уже есть', 'Первый', 'Второй']
+        )
+
+    def test_dates_are_kept_only_for_imported_objects(self):
+        moment = datetime(2020, 5, 1, 10, tzinfo=timezone.utc)
+        importing.dated(Post).bulk_create([
+            Post(
+                text='Старый', author=self.author,
+                pub_date=moment, updated=moment
+            )
+        ])
+        Post.objects.bulk_create([
+            Post(text='Новый', author=self.author, pub_date=moment)
+        ])
+        self.assertEqual(
+            Post.objects.get(text='Старый').pub_date, moment
+        )
+        self.assertGreater(Post.objects.get(text='Новый').pub_date, moment)
+
+    def test_create_missing(self):
+        follows = write('follows.csv', 'user,author\nnew-reader,new-author\n')
+        run('follow', follows, '--create-missing', '--skip-derived')
+        follow = Follow.objects.get()
+        self.assertEqual(follow.user.username, 'new-reader')
+        self.assertFalse(follow.author.has_usable_password())
+
+    def test_commits_in_chunks(self):
+        posts = write('many.jsonl', jsonl(*(
+            {'text': f'Пост {number}', 'author': 'author'}
+            for number in range(7)
+        )))
+        out, err = run(
+            'post', posts, '--batch-size', '2', '--commit-every', '4',
+            '--skip-derived'
+        )
+        self.assertEqual(out.count('Записано'), 2)
+        self.assertEqual(Post.objects.count(), 7)
+
+
+class DropIndexesTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_indexes_are_restored(self):
+        User.objects.create_user(username='author')
+        posts = write('indexed.jsonl', jsonl(
+            {'text': 'Пост', 'author': 'author'}
+        ))
+
+        def indexes():
+            with connection.cursor() as cursor:
+                return connection.introspection.get_constraints(
+                    cursor, Post._meta.db_table
+                ).keys()
+
+        before = set(indexes())
+        run('post', posts, '--drop-indexes', '--skip-derived')
+        self.assertEqual(set(indexes()), before)
+        self.assertEqual(Post.objects.count(), 1)
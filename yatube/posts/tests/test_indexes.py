@@ -0,0 +1,83 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+# Полный проход по таблице или сортировка во временном B-дереве
+# означают, что запрос не попал в индекс.
+FULL_SCAN = re.compile(r'SCAN (TABLE )?(?P<table>\w+)(?! USING)( |$)')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY')
+
+
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for _ in range(12):
+            cls.post = Post.objects.create(
+                author=cls.author, text='Тестовый пост', group=cls.group
+            )
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Тестовый комментарий'
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def query_plans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+            if response.context:
+                page_obj = response.context.get('page_obj')
+                if page_obj is not None and page_obj.has_next():
+                    self.authorized_client.get(
+                        f'{url}?cursor={page_obj.next_cursor()}'
+                    )
+        selects = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        self.assertTrue(selects)
+        with connection.cursor() as cursor:
+            for sql in selects:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                yield sql, [row[-1] for row in cursor.fetchall()]
+
+    def test_views_use_indexes(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            for sql, plan in self.query_plans(url):
+                with self.subTest(url=url, sql=sql):
+                    for step in plan:
+                        self.assertIsNone(FULL_SCAN.search(step), plan)
+                        self.assertIsNone(TEMP_SORT.search(step), plan)
+
+    def test_follow_is_unique(self):
+        url = reverse('posts:profile_follow', kwargs={'username': 'auth'})
+        self.authorized_client.get(url)
+        self.authorized_client.get(url)
+        self.assertEqual(
+            Follow.objects.filter(user=self.user, author=self.author).count(),
+            1
+        )
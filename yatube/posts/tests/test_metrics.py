@@ -0,0 +1,96 @@
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import metrics
+from posts.models import Group, Post, User
+
+
+@override_settings(POSTS_METRICS_SAMPLE_RATE=1)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_request_is_logged(self):
+        with self.assertLogs('posts.metrics', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertIn('page:miss', record['cache'])
+
+    @override_settings(POSTS_METRICS_TOKEN='secret')
+    def test_prometheus_export(self):
+        with self.assertLogs('posts.metrics', 'INFO'):
+            self.client.get(reverse('posts:index'))
+            self.client.get(reverse('posts:index'))
+            response = self.client.get(
+                reverse('posts:metrics'), HTTP_AUTHORIZATION='Bearer secret'
+            )
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            text
+        )
+        self.assertIn(
+            'yatube_responses_total{view="posts:index",status="200"} 2',
+            text
+        )
+        self.assertIn('yatube_db_queries_total{view="posts:index"}', text)
+        self.assertIn(
+            'yatube_cache_events_total{view="posts:index",'
+            'namespace="page",event="hit"} 1',
+            text
+        )
+
+    @override_settings(POSTS_METRICS_TOKEN='secret')
+    def test_export_is_private(self):
+        url = reverse('posts:metrics')
+        with self.assertLogs('posts.metrics', 'INFO'):
+            # Локальный адрес (прокси) доступа не даёт.
+            self.assertEqual(
+                self.client.get(url, REMOTE_ADDR='127.0.0.1').status_code,
+                404
+            )
+            response = self.client.get(
+                url, HTTP_AUTHORIZATION='Bearer wrong'
+            )
+            self.assertEqual(response.status_code, 404)
+            self.client.force_login(
+                User.objects.create_user(username='staff', is_staff=True)
+            )
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_export_without_token_is_staff_only(self):
+        with self.assertLogs('posts.metrics', 'INFO'):
+            response = self.client.get(
+                reverse('posts:metrics'), HTTP_AUTHORIZATION='Bearer '
+            )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(POSTS_METRICS_SAMPLE_RATE=0)
+    def test_disabled(self):
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('posts.metrics', 'INFO'):
+                Client().get(reverse('posts:index'))
+        self.assertNotIn('posts:index', metrics.render_prometheus())
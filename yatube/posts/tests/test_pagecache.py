@@ -0,0 +1,82 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import caching
+from posts.models import Follow, Post, User
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        caching.reset_stats()
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_public_pages_are_served_from_cache(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.id,)),
+            reverse('about:author'),
+            reverse('about:tech'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                response = self.client.get(url)
+                self.assertEqual(response.content, first.content)
+                self.assertIsNone(response.context)
+        self.assertEqual(caching.stats()[('page', 'hit')], len(urls))
+
+    def test_holes_are_rendered_per_user(self):
+        url = reverse('posts:profile', args=(self.author.username,))
+        anonymous = self.client.get(url)
+        self.assertContains(anonymous, 'Войти')
+        self.assertContains(anonymous, 'Подписаться')
+
+        response = self.reader_client.get(url)
+        # View не вызывался: отрисованы только дыры.
+        self.assertNotIn('page_obj', response.context)
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertNotContains(response, 'Войти')
+        self.assertContains(response, 'Подписаться')
+        self.assertNotContains(response, '<!--hole:')
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.reader_client.get(url), 'Отписаться')
+        response = self.author_client.get(url)
+        self.assertNotContains(response, 'Подписаться')
+        self.assertContains(response, 'Пользователь: author')
+
+    def test_post_detail_holes(self):
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        self.client.get(url)
+        response = self.author_client.get(url)
+        self.assertContains(response, 'редактировать запись')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = self.reader_client.get(url)
+        self.assertNotContains(response, 'редактировать запись')
+        self.assertContains(response, 'Добавить комментарий')
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Добавить комментарий')
+
+    def test_changes_reach_cached_pages(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_missing_pages_are_not_cached(self):
+        url = reverse('posts:post_detail', args=(self.post.id + 1,))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertNotIn(('page', 'hit'), caching.stats())
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import profiling
+from posts.models import Post, User
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    POSTS_SLOW_REQUEST_THRESHOLD=0,
+    POSTS_SLOW_REQUEST_DIR=TEMP_DIR,
+    POSTS_SLOW_REQUEST_KEEP=2
+)
+class SlowRequestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_slow_request_is_captured(self):
+        self.client.get(reverse('posts:post_detail', args=(self.post.id,)))
+        names = profiling.snapshots()
+        self.assertEqual(len(names), 1)
+        data = profiling.load(names[0])
+        self.assertEqual(data['view'], 'posts:post_detail')
+        self.assertEqual(data['status'], 200)
+        self.assertTrue(data['queries'])
+
+    def test_other_views_are_not_watched(self):
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(profiling.snapshots(), [])
+
+    @override_settings(POSTS_SLOW_REQUEST_THRESHOLD=60)
+    def test_fast_request_is_dropped(self):
+        self.client.get(reverse('posts:post_detail', args=(self.post.id,)))
+        self.assertEqual(profiling.snapshots(), [])
+
+    def test_rotation(self):
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        for number in range(3):
+            self.client.get(url, {'page': number})
+        self.assertEqual(len(os.listdir(TEMP_DIR)), 2)
+
+    def test_snapshot_pages(self):
+        self.client.get(reverse('posts:post_detail', args=(self.post.id,)))
+        name = profiling.snapshots()[0]
+        response = self.client.get(reverse('posts:slow_requests'))
+        self.assertEqual(response.status_code, 302)
+
+        response = self.staff_client.get(reverse('posts:slow_requests'))
+        self.assertContains(
+            response, reverse('posts:slow_request', args=(name,))
+        )
+        response = self.staff_client.get(
+            reverse('posts:slow_request', args=(name,))
+        )
+        self.assertContains(response, 'posts:post_detail')
+        response = self.staff_client.get(
+            reverse('posts:slow_request', args=('missing.json',))
+        )
+        self.assertEqual(response.status_code, 404)
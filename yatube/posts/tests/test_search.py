@@ -0,0 +1,100 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post, SearchTerm, User
+from posts.utils import POSTS_PER_PAGE
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='auth')
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+
+    def setUp(self):
+        cache.clear()
+        search.rebuild()
+        self.hedgehog = Post.objects.create(
+            author=self.user, text='Ёжик в тумане. Ёжик и лошадь.'
+        )
+        self.fog = Post.objects.create(
+            author=self.user, text='Туман над рекой, ёжик спит'
+        )
+        self.other = Post.objects.create(
+            author=self.user, text='Совсем другой пост'
+        )
+
+    def found(self, query):
+        return list(search.SearchResults(query)[0:10])
+
+    def test_tokenize(self):
+        self.assertEqual(
+            search.tokenize('Ёжик, в ТУМАНЕ_2!'),
+            ['ежик', 'в', 'тумане', '2']
+        )
+
+    def test_short_terms_are_not_prefixes(self):
+        self.assertEqual(self.found('ту'), [])
+
+    def test_ranked_results(self):
+        self.assertEqual(self.found('ежик'), [self.hedgehog, self.fog])
+        self.assertEqual(self.found('туман ёжик'), [self.hedgehog, self.fog])
+        self.assertEqual(self.found('лошадь'), [self.hedgehog])
+        self.assertEqual(self.found('лошадь пост'), [])
+        self.assertEqual(self.found('!!!'), [])
+
+    def test_index_follows_post_changes(self):
+        self.other.text = 'Теперь и здесь ёжик'
+        self.other.save()
+        self.assertIn(self.other, self.found('ежик'))
+        self.fog.delete()
+        self.assertEqual(search.SearchResults('ежик').count(), 2)
+
+    def test_search_view_paginates(self):
+        for number in range(POSTS_PER_PAGE):
+            Post.objects.create(author=self.user, text=f'ежик номер {number}')
+        response = self.client.get(reverse('posts:search'), {'q': 'Ежик'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, POSTS_PER_PAGE + 2)
+        self.assertEqual(len(page_obj), POSTS_PER_PAGE)
+        self.assertContains(response, '?q=%D0%95%D0%B6%D0%B8%D0%BA&page=2')
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'Ежик', 'page': 2}
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_search_view_without_query(self):
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page_obj'])
+
+    def test_admin_search_uses_index(self):
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'туман'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {self.hedgehog, self.fog}
+        )
+
+    def test_rebuild_command(self):
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Проиндексировано постов: 3', out.getvalue())
+
+
+@override_settings(POSTS_SEARCH_BACKEND='table')
+class TableSearchTest(SearchTest):
+    def test_terms_are_stored(self):
+        self.assertEqual(
+            SearchTerm.objects.get(post=self.hedgehog, term='ежик').count, 2
+        )
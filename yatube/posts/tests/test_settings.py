@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+SCRIPT = '''
+import json
+from django.conf import settings
+print(json.dumps({
+    'debug': settings.DEBUG,
+    'loader': settings.TEMPLATES[0]['OPTIONS']['loaders'][0][0],
+    'conn_max_age': settings.DATABASES['default']['CONN_MAX_AGE'],
+    'session_engine': settings.SESSION_ENGINE,
+    'staticfiles_storage': settings.STATICFILES_STORAGE,
+    'write_buffer': settings.POSTS_WRITE_BUFFER,
+}))
+'''
+
+
+class SettingsProfileTest(SimpleTestCase):
+    # Настройки читаются один раз на процесс: каждый профиль — в своём.
+
+    def load(self, profile, **env):
+        environ = {
+            name: value for name, value in os.environ.items()
+            if name != 'SETTINGS_PROFILE'
+        }
+        environ.update(
+            env,
+            SETTINGS_PROFILE=profile,
+            DJANGO_SETTINGS_MODULE='yatube.settings'
+        )
+        return subprocess.run(
+            [sys.executable, '-c', SCRIPT], cwd=settings.BASE_DIR,
+            env=environ, capture_output=True, text=True
+        )
+
+    def test_prod_requires_secrets(self):
+        result = self.load('prod')
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('SECRET_KEY', result.stderr)
+
+    def test_prod(self):
+        result = self.load(
+            'prod', SECRET_KEY='secret', ALLOWED_HOSTS='example.com'
+        )
+        values = json.loads(result.stdout)
+        self.assertFalse(values['debug'])
+        self.assertEqual(
+            values['loader'], 'django.template.loaders.cached.Loader'
+        )
+        self.assertEqual(values['conn_max_age'], 600)
+        self.assertTrue(values['session_engine'].endswith('cached_db'))
+        self.assertTrue(
+            values['staticfiles_storage'].endswith(
+                'ManifestStaticFilesStorage'
+            )
+        )
+
+    def test_bench_ignores_environment(self):
+        result = self.load('bench', WRITE_BUFFER='thread', DB_CONN_MAX_AGE='0')
+        values = json.loads(result.stdout)
+        self.assertFalse(values['debug'])
+        self.assertEqual(values['write_buffer'], 'off')
+        self.assertEqual(values['conn_max_age'], 600)
+
+    def test_unknown_profile(self):
+        result = self.load('staging')
+        self.assertIn('staging', result.stderr)
+        self.assertNotEqual(result.returncode, 0)
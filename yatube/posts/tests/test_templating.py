@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import templating
+from posts.models import Post, User
+
+TEMP_TEMPLATES = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def cached_templates(dirs):
+    return [dict(
+        settings.TEMPLATES[0],
+        DIRS=dirs,
+        APP_DIRS=False,
+        OPTIONS=dict(settings.TEMPLATES[0]['OPTIONS'], loaders=[
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ]),
+    )]
+
+
+class TemplatingTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_TEMPLATES, ignore_errors=True)
+
+    def test_project_templates_compile(self):
+        out = StringIO()
+        call_command('compile_templates', stdout=out)
+        self.assertIn('Разобрано шаблонов', out.getvalue())
+
+    def test_broken_template_is_reported(self):
+        with open(os.path.join(TEMP_TEMPLATES, 'broken.html'), 'w') as f:
+            f.write('{% if %}')
+        try:
+            with override_settings(TEMPLATES=cached_templates(
+                settings.TEMPLATES[0]['DIRS'] + [TEMP_TEMPLATES]
+            )):
+                with self.assertRaisesMessage(CommandError, 'broken.html'):
+                    call_command('compile_templates', stdout=StringIO())
+        finally:
+            os.remove(os.path.join(TEMP_TEMPLATES, 'broken.html'))
+
+    def test_warm_up_fills_cached_loader(self):
+        with override_settings(
+            TEMPLATES=cached_templates(settings.TEMPLATES[0]['DIRS'])
+        ):
+            templating.warm_up()
+            [engine] = templating.django_engines()
+            [loader] = engine.template_loaders
+            self.assertIn('base.html', loader.get_template_cache)
+            self.assertIn(
+                'posts/includes/paginator.html', loader.get_template_cache
+            )
+
+    def test_render_profile(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост')
+        with templating.profile_templates() as profile:
+            Client().get(reverse('posts:index'))
+        base = profile.templates['base.html']
+        header = profile.templates['includes/header.html']
+        self.assertEqual(base.count, 1)
+        # Вложенный header входит во время base.html, но не в своё.
+        self.assertGreaterEqual(base.total, base.own + header.total)
+        self.assertIn('{% post_picture %}', profile.tags)
+        names = [row[0] for row in profile.rows()]
+        self.assertIn('posts/index.html', names)
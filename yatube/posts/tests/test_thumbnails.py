@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+
+from posts import thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_QUEUE='thread')
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+        default.kvstore.clear()
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Тестовый пост',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif')
+        )
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', lambda func: func())
+    def test_page_renders_placeholder_and_queues_thumbnail(self):
+        with mock.patch.object(thumbnails, '_submit') as submit:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'bg-light')
+        self.assertNotContains(response, '<img class="card-img')
+        # Одна задача на все варианты картинки.
+        submit.assert_called_once_with(
+            thumbnails.variants_job(self.post.image.name)
+        )
+
+    def run_variant_jobs(self):
+        with mock.patch('posts.thumbnails.connections'):
+            thumbnails._run_in_worker(
+                thumbnails.variants_job(self.post.image.name)
+            )
+
+    def test_caches_are_reset_once_per_image(self):
+        with mock.patch(
+            'posts.conditional.touch_posts'
+        ) as touch_posts, mock.patch(
+            'posts.caching.invalidate_posts'
+        ) as invalidate_posts:
+            self.run_variant_jobs()
+        self.assertEqual(touch_posts.call_count, 1)
+        self.assertEqual(invalidate_posts.call_count, 1)
+
+    def test_generated_thumbnail_replaces_placeholder(self):
+        self.client.get(reverse('posts:index'))
+        self.run_variant_jobs()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<img class="card-img')
+
+    def test_picture_has_srcset_for_every_format(self):
+        self.run_variant_jobs()
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,))
+        )
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'srcset=', count=len(
+            thumbnails.supported_formats()
+        ))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, '.webp 480w')
+        self.assertContains(response, '.jpg 960w')
+        # Картинка 2x1 не растягивается до 1440px.
+        self.assertNotContains(response, '1440w')
+
+    def test_post_create_schedules_thumbnail(self):
+        with mock.patch.object(
+            thumbnails, 'schedule_variants'
+        ) as schedule_variants:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={
+                    'text': 'Новый пост',
+                    'image': SimpleUploadedFile(
+                        'new.gif', SMALL_GIF, 'image/gif'
+                    )
+                }
+            )
+        schedule_variants.assert_called_once_with('posts/new.gif')
+
+    def test_warm_thumbnails_command(self):
+        out = StringIO()
+        call_command('warm_thumbnails', workers=1, stdout=out)
+        total = len(os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'posts')))
+        self.assertIn(f'{total} из {total}', out.getvalue())
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = self.client.get(reverse('posts:index'))
+        schedule.assert_not_called()
+        self.assertContains(response, '<img class="card-img')
@@ -0,0 +1,91 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_jpeg(size, orientation=None):
+    image = Image.new('RGB', size, 'red')
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_QUEUE='thread')
+class ImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, content, name='photo.jpg'):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с фото',
+                'image': SimpleUploadedFile(name, content, 'image/jpeg')
+            }
+        )
+
+    @override_settings(POSTS_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_upload_over_byte_limit_is_rejected(self):
+        response = self.upload(make_jpeg((50, 50)))
+        self.assertFormError(
+            response, 'form', 'image', 'Файл слишком большой: максимум 0 МБ.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POSTS_IMAGE_MAX_PIXELS=1000)
+    def test_upload_over_pixel_limit_is_rejected(self):
+        response = self.upload(make_jpeg((50, 50)))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].has_error('image'))
+        self.assertFalse(Post.objects.exists())
+
+    def test_non_image_upload_is_rejected(self):
+        response = self.upload(b'hello', name='notes.txt')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response.context['form'].has_error('image', 'invalid_image')
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POSTS_IMAGE_MAX_SIDE=40)
+    def test_upload_is_downscaled_and_stripped(self):
+        # Ориентация 6: снимок повёрнут, после нормализации 20x40.
+        self.upload(make_jpeg((80, 40), orientation=6))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertFalse(image.getexif())
+
+    def test_clean_image_is_stored_as_is(self):
+        image = Image.new('RGB', (50, 50), 'red')
+        buffer = BytesIO()
+        image.save(buffer, 'PNG')
+        self.upload(buffer.getvalue(), name='clean.png')
+        post = Post.objects.get()
+        with open(post.image.path, 'rb') as stored:
+            self.assertEqual(stored.read(), buffer.getvalue())
@@ -1,14 +1,17 @@
 import shutil
 import tempfile
+from unittest import mock
 from django.core.cache import cache
 
 from django import forms
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import Page, Paginator
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from posts.models import Group, Post, User
+from posts.models import Comment, FeedEntry, Follow, Group, Post, User
+from posts.paginators import CursorPaginator
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -179,16 +182,84 @@ class PostPagesTests(TestCase):
         self.assertEqual(self.post.image, response.context['post'].image)
 
     def test_index_cache(self):
-        response_1 = self.client.get(reverse('posts:index'))
+        url = reverse('posts:index')
+        self.client.get(url)
+        # Анонимная страница целиком берётся из кеша.
+        with self.assertNumQueries(0):
+            self.client.get(url)
         Post.objects.create(
             author=self.user,
             text = 'Тестовый текст'
         )
-        response_2 = self.client.get(reverse('posts:index'))
-        self.assertEqual(response_1.content,response_2.content)
+        response = self.client.get(url)
+        self.assertContains(response, 'Тестовый текст')
+
+
+class FragmentCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='auth')
+
+    def setUp(self):
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        self.post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
         cache.clear()
-        response = self.client.get(reverse('posts:index'))
-        self.assertNotEqual(response.content,response_2.content)
+
+    def test_edited_post_is_rendered_fresh(self):
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in pages:
+            self.client.get(url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Изменённый пост', 'group': self.group.id}
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Изменённый пост')
+                self.assertNotContains(response, 'Тестовый пост')
+
+    def test_group_change_invalidates_cards(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.group.slug = 'new-slug'
+        self.group.save()
+        response = self.client.get(url)
+        self.assertContains(response, '/group/new-slug/')
+        self.group.delete()
+        response = self.client.get(url)
+        self.assertNotContains(response, '/group/')
+
+    def test_author_rename_invalidates_cards(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.user.first_name = 'Лев'
+        self.user.last_name = 'Толстой'
+        self.user.save()
+        self.assertContains(self.client.get(url), 'Лев Толстой')
+
+    def test_new_comment_invalidates_comments(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.client.get(url)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый комментарий'}
+        )
+        self.assertContains(self.client.get(url), 'Новый комментарий')
 
 
 class PaginatorViewsTest(TestCase):
@@ -246,6 +317,51 @@ class PaginatorViewsTest(TestCase):
         )
         self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_cursor_pages_follow_each_other(self):
+        url = reverse('posts:index')
+        first_page = self.client.get(url).context['page_obj']
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+        second_page = self.client.get(
+            f'{url}?cursor={first_page.next_cursor()}'
+        ).context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        self.assertEqual(
+            list(first_page) + list(second_page), expected
+        )
+        previous_page = self.client.get(
+            f'{url}?cursor={second_page.previous_cursor()}'
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
+        self.assertFalse(previous_page.has_previous())
+
+    def test_cursor_page_does_not_count(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        with self.assertNumQueries(1):
+            page = paginator.page()
+        with self.assertNumQueries(1):
+            paginator.page(page.next_cursor())
+
+    def test_cursor_page_counts_only_on_demand(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.page(paginator.page().next_cursor())
+        self.assertIsInstance(page, Page)
+        self.assertIsInstance(paginator, Paginator)
+        with self.assertNumQueries(1):
+            self.assertEqual(page.number, 2)
+            self.assertEqual(page.start_index(), 11)
+            self.assertEqual(page.end_index(), 13)
+        self.assertEqual(paginator.num_pages, 2)
+        self.assertFalse(page.has_next())
+        self.assertEqual(page.previous_page_number(), 1)
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.client.get(reverse('posts:index') + '?cursor=xx!')
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
 class FollowViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -280,3 +396,194 @@ class FollowViewsTest(TestCase):
         response = self.authorized_client.get(reverse("posts:follow_index"))
         self.assertNotIn(post, response.context["page_obj"])
         
+
+class QueryBudgetTest(TestCase):
+    # Число запросов на страницу не должно зависеть от числа постов,
+    # авторов и комментариев на ней.
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        for i in range(12):
+            author = User.objects.create(username=f'author{i}')
+            group = Group.objects.create(
+                title=f'Группа {i}',
+                slug=f'group-{i}',
+                description='Тестовое описание'
+            )
+            post = Post.objects.create(
+                author=author, text='Тестовый пост', group=group
+            )
+            Follow.objects.create(user=cls.user, author=author)
+        cls.post = post
+        cls.group = group
+        for i in range(5):
+            Comment.objects.create(
+                post=post,
+                author=User.objects.create(username=f'commentator{i}'),
+                text='Тестовый комментарий'
+            )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryBudgetTest.user)
+        cache.clear()
+
+    def test_public_pages_query_budget(self):
+        budgets = {
+            reverse('posts:index'): 1,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 2,
+            reverse(
+                'posts:profile', kwargs={'username': self.post.author}
+            ): 2,
+            # Плюс запрос автора поста для проверки свежести.
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}): 3,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    self.client.get(url)
+
+    def test_follow_index_query_budget(self):
+        url = reverse('posts:follow_index')
+        # Первый запрос прогревает кеш популярных авторов.
+        self.authorized_client.get(url)
+        # Сессия и пользователь + сама лента.
+        with self.assertNumQueries(3):
+            response = self.authorized_client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='writer')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(TimelineTest.reader)
+        cache.clear()
+
+    def get_feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.get_feed(), [post])
+
+    def test_follow_backfills_and_unfollow_clears_feed(self):
+        posts = [
+            Post.objects.create(author=self.author, text='Тестовый пост')
+            for _ in range(3)
+        ]
+        with mock.patch('posts.feeds.FEED_LENGTH', 2):
+            Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.get_feed(), posts[:0:-1])
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.get_feed(), [])
+
+    def test_popular_author_is_read_on_demand(self):
+        url = reverse('posts:follow_index')
+        with mock.patch('posts.feeds.FANOUT_LIMIT', 0):
+            Follow.objects.create(user=self.reader, author=self.author)
+            posts = [
+                Post.objects.create(author=self.author, text='Тестовый пост')
+                for _ in range(12)
+            ]
+            self.assertFalse(
+                FeedEntry.objects.filter(user=self.reader).exists()
+            )
+            first_page = self.authorized_client.get(url).context['page_obj']
+            second_page = self.authorized_client.get(
+                f'{url}?cursor={first_page.next_cursor()}'
+            ).context['page_obj']
+        self.assertEqual(list(first_page) + list(second_page), posts[::-1])
+
+    @mock.patch('posts.feeds.TRIM_INTERVAL', 1)
+    @mock.patch('posts.feeds.FEED_LENGTH', 2)
+    def test_fan_out_trims_feeds(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text='Тестовый пост')
+            for _ in range(4)
+        ]
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=self.reader).order_by(
+                '-post_id'
+            ).values_list('post_id', flat=True)),
+            [post.id for post in posts[:1:-1]]
+        )
+
+    @mock.patch('posts.feeds.FANOUT_LIMIT', 1)
+    def test_posts_stay_in_feed_when_author_is_no_longer_popular(self):
+        other = User.objects.create(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        # Набор популярных авторов обновился.
+        cache.clear()
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertEqual(self.get_feed(), [post])
+        Follow.objects.filter(user=other).delete()
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.get_feed(), [post])
+
+
+@mock.patch('posts.utils.COMMENTS_PER_PAGE', 2)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create(username='author')
+        cls.post = Post.objects.create(author=author, text='Тестовый пост')
+        for i in range(5):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create(username=f'commentator{i}'),
+                text=f'Комментарий {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_comments_load_by_cursor(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        page = response.context['comments_page']
+        self.assertEqual(
+            [comment.text for comment in page],
+            ['Комментарий 0', 'Комментарий 1']
+        )
+        self.assertNotContains(response, 'Комментарий 2')
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        texts = []
+        cursor = page.next_cursor()
+        while cursor:
+            # Пост и страница комментариев с авторами, сколько бы их ни было.
+            with self.assertNumQueries(2):
+                response = self.client.get(url, {'cursor': cursor})
+            page = response.context['page_obj']
+            texts.extend(comment.text for comment in page)
+            cursor = page.next_cursor()
+        self.assertEqual(
+            texts, ['Комментарий 2', 'Комментарий 3', 'Комментарий 4']
+        )
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'cursor': 'broken'}
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import writebuffer
+from posts.models import Comment, Follow, Post, User, UserStats
+
+
+@override_settings(POSTS_WRITE_BUFFER='manual')
+class WriteBufferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def tearDown(self):
+        writebuffer.flush()
+
+    def test_comment_is_visible_to_author_before_write(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        # Без запроса поста: его проверит писатель.
+        with self.assertNumQueries(2):
+            self.client.post(
+                reverse('posts:add_comment', args=(self.post.id,)),
+                {'text': 'Из очереди'}
+            )
+        self.assertFalse(Comment.objects.exists())
+        self.assertContains(self.client.get(url), 'Из очереди')
+        self.assertNotContains(Client().get(url), 'Из очереди')
+
+        writebuffer.flush()
+        comment = Comment.objects.get()
+        self.assertEqual(comment.author, self.reader)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(writebuffer.pending(self.reader), [])
+        self.assertContains(self.client.get(url), 'Из очереди', count=1)
+
+    def test_comment_to_deleted_post_is_dropped(self):
+        post = Post.objects.create(author=self.author, text='Удалённый')
+        writebuffer.submit_comment(self.reader, post.id, 'Опоздал')
+        writebuffer.submit_comment(self.reader, self.post.id, 'Успел')
+        post.delete()
+        writebuffer.flush()
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)), ['Успел']
+        )
+
+    def test_last_follow_operation_wins(self):
+        profile = reverse('posts:profile', args=(self.author.username,))
+        self.client.get(reverse('posts:profile_follow', args=('author',)))
+        self.assertFalse(Follow.objects.exists())
+        self.assertContains(self.client.get(profile), 'Отписаться')
+        self.client.get(reverse('posts:profile_unfollow', args=('author',)))
+        self.assertContains(self.client.get(profile), 'Подписаться')
+        self.client.get(reverse('posts:profile_follow', args=('author',)))
+
+        writebuffer.flush()
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1
+        )
+        self.assertIsNone(
+            writebuffer.pending_following(self.reader, 'author')
+        )
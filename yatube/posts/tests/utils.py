@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class OnCommitMixin:
+    """captureOnCommitCallbacks из Django 3.2 для TestCase.
+
+    Кеш и метки свежести обновляются ещё раз в transaction.on_commit, а
+    TestCase транзакцию не фиксирует.
+    """
+
+    @contextmanager
+    def captureOnCommitCallbacks(self, *, using=DEFAULT_DB_ALIAS,
+                                 execute=False):
+        callbacks = []
+        start = len(connections[using].run_on_commit)
+        try:
+            yield callbacks
+        finally:
+            run_on_commit = connections[using].run_on_commit
+            while True:
+                new = [func for _, func in run_on_commit[start:]]
+                if not new:
+                    break
+                start = len(run_on_commit)
+                callbacks.extend(new)
+                if not execute:
+                    break
+                for callback in new:
+                    callback()
@@ -0,0 +1,255 @@
+"""Фоновая генерация миниатюр для картинок постов.
+
+Тег {% thumbnail %} работает через DeferredThumbnailBackend: готовая
+миниатюра берётся из хранилища ключей sorl, а недостающая ставится в
+очередь, и шаблон до её появления показывает заглушку из {% empty %}.
+Очередь задаётся настройкой POSTS_THUMBNAIL_QUEUE: 'thread' — пул
+потоков в процессе воркера, 'immediate' — генерация на месте
+(для тестов и локальной отладки).
+
+Для адаптивных картинок каждая миниатюра строится в нескольких
+ширинах и форматах (variants), а шаблон собирает из готовых
+вариантов <picture> со srcset. Все варианты картинки строит одна
+задача, и кеши постов с этой картинкой сбрасываются один раз, после
+последнего варианта.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Геометрия и опции миниатюры из шаблонов постов.
+POST_GEOMETRY = '960x339'
+POST_OPTIONS = {'crop': 'center', 'upscale': True}
+MAX_WORKERS = 2
+
+# Ширины вариантов для srcset; пропорции те же, что у POST_GEOMETRY.
+# Шире базовой картинки варианты не растягиваются.
+VARIANT_WIDTHS = (480, 960, 1440)
+# Форматы от лучшего сжатия к худшему; JPEG — запасной для <img>.
+# Качество подобрано так, чтобы картинки выглядели одинаково.
+VARIANT_FORMATS = (
+    ('AVIF', 'image/avif', 60),
+    ('WEBP', 'image/webp', 80),
+    ('JPEG', 'image/jpeg', 85),
+)
+FALLBACK_FORMAT = 'JPEG'
+
+# sorl не знает расширения AVIF (нужен Pillow с поддержкой AVIF
+# или плагин pillow-avif-plugin).
+EXTENSIONS.setdefault('AVIF', 'avif')
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def queue_mode():
+    return getattr(settings, 'POSTS_THUMBNAIL_QUEUE', 'thread')
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_WORKERS, thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+def generate(name, geometry=POST_GEOMETRY, **options):
+    """Синхронно создать миниатюру, если её ещё нет."""
+    with metrics.thumbnail_timer():
+        return ThumbnailBackend().get_thumbnail(
+            name, geometry, **(options or POST_OPTIONS)
+        )
+
+
+def supported_formats():
+    """Форматы вариантов, которые умеет сохранять установленный Pillow."""
+    Image.init()
+    return tuple(
+        (format_, mime, quality)
+        for format_, mime, quality in VARIANT_FORMATS
+        if format_ in Image.SAVE
+    )
+
+
+def variant_specs():
+    """Пары (геометрия, опции) для всех вариантов картинки поста."""
+    base_width, base_height = map(int, POST_GEOMETRY.split('x'))
+    specs = []
+    for format_, _, quality in supported_formats():
+        for width in VARIANT_WIDTHS:
+            geometry = f'{width}x{round(width * base_height / base_width)}'
+            options = dict(
+                POST_OPTIONS,
+                upscale=POST_OPTIONS['upscale'] and width <= base_width,
+                format=format_,
+                quality=quality
+            )
+            specs.append((geometry, options))
+    return specs
+
+
+def variants(image):
+    """Готовые варианты картинки, сгруппированные по форматам.
+
+    Возвращает список (mime, формат, [(миниатюра, ширина), ...]);
+    недостающие варианты ставятся в очередь.
+    """
+    if not image:
+        return []
+    backend = default.backend
+    mime_types = {
+        format_: mime for format_, mime, _ in supported_formats()
+    }
+    deferred = (
+        isinstance(backend, DeferredThumbnailBackend)
+        and queue_mode() != 'immediate'
+    )
+    ready = {}
+    missing = False
+    for geometry, options in variant_specs():
+        if deferred:
+            thumbnail = backend.cached(image, geometry, **options)
+        else:
+            thumbnail = backend.get_thumbnail(image, geometry, **options)
+        if thumbnail is None:
+            missing = True
+            continue
+        # Без растягивания вариант шире оригинала получается не шире
+        # предыдущего, и в srcset он ничего не добавляет.
+        items = ready.setdefault(options['format'], [])
+        if not items or thumbnail.width > items[-1][1]:
+            items.append((thumbnail, thumbnail.width))
+    if missing:
+        schedule_variants(image.name)
+    return [
+        (mime_types[format_], format_, items)
+        for format_, items in ready.items()
+    ]
+
+
+def generate_variants(name):
+    """Синхронно создать все варианты картинки."""
+    for geometry, options in variant_specs():
+        generate(name, geometry, **options)
+
+
+def _spec(geometry, options):
+    return geometry, tuple(sorted(options.items()))
+
+
+def variants_job(name):
+    """Задача на все варианты картинки: (имя, ((геометрия, опции), ...))."""
+    return name, tuple(
+        _spec(geometry, options) for geometry, options in variant_specs()
+    )
+
+
+def _schedule(job):
+    if queue_mode() == 'immediate':
+        _run(job)
+        return
+    transaction.on_commit(lambda: _submit(job))
+
+
+def schedule(name, geometry=POST_GEOMETRY, **options):
+    """Поставить генерацию миниатюры в очередь после коммита."""
+    _schedule((name, (_spec(geometry, options or POST_OPTIONS),)))
+
+
+def schedule_variants(name):
+    """Поставить в очередь одну задачу на все варианты картинки."""
+    _schedule(variants_job(name))
+
+
+def _submit(job):
+    with _lock:
+        if job in _pending:
+            return
+        _pending.add(job)
+    _get_executor().submit(_run_in_worker, job)
+
+
+def _run(job):
+    name, specs = job
+    for geometry, options in specs:
+        generate(name, geometry, **dict(options))
+
+
+def _run_in_worker(job):
+    from . import caching, conditional
+    from .models import Post
+
+    try:
+        _run(job)
+        # Карточки с заглушкой уже могли попасть в кеш фрагментов
+        # и в кеш браузеров; сбрасываем их раз на задачу.
+        posts = Post.objects.filter(image=job[0])
+        caching.invalidate_posts(posts)
+        conditional.touch_posts(posts)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', job[0])
+    finally:
+        with _lock:
+            _pending.discard(job)
+        connections.close_all()
+
+
+def wait():
+    """Дождаться завершения всех поставленных задач."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который не ресайзит картинки во время рендеринга."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if queue_mode() == 'immediate' or not file_:
+            return super().get_thumbnail(file_, geometry_string, **options)
+        cached = self.cached(file_, geometry_string, **options)
+        if cached:
+            return cached
+        schedule(ImageFile(file_).name, geometry_string, **options)
+        return None
+
+    def cached(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища ключей или None."""
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self._prepare_options(source, options)
+        )
+        return default.kvstore.get(ImageFile(name, default.storage)) or None
+
+    def _prepare_options(self, source, options):
+        # Те же умолчания, что и в ThumbnailBackend.get_thumbnail,
+        # иначе имя файла миниатюры не совпадёт.
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
@@ -0,0 +1,146 @@
+"""Потоковая загрузка и нормализация картинок постов.
+
+ImageUploadHandler пишет загружаемый файл кусками во временный файл и
+бросает его, как только превышен лимит по байтам, так что в памяти
+воркера никогда не оказывается больше одного куска. Затем поле формы
+читает только заголовок картинки и проверяет размеры в пикселях, а
+normalize() убирает EXIF и уменьшает слишком большие оригиналы.
+Для JPEG уменьшение идёт через draft(): декодер сразу отдаёт картинку
+в 2, 4 или 8 раз меньше, и полный кадр в память не разворачивается.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile, UploadedFile
+)
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+# Значения по умолчанию; переопределяются одноимёнными настройками
+# с префиксом POSTS_IMAGE_.
+MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+MAX_PIXELS = 50_000_000
+MAX_SIDE = 2560
+JPEG_QUALITY = 90
+
+# Форматы, которые при нормализации пересохраняются в себя же.
+# GIF без нужды не трогаем, чтобы не потерять анимацию.
+REENCODE_FORMATS = {
+    'JPEG': 'JPEG',
+    'MPO': 'JPEG',
+    'PNG': 'PNG',
+    'WEBP': 'WEBP',
+    'TIFF': 'PNG',
+}
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+
+def limit(name):
+    return getattr(settings, f'POSTS_IMAGE_{name}', globals()[name])
+
+
+def format_size(size):
+    return f'{size / 1024 / 1024:.0f} МБ'
+
+
+class RejectedUpload(UploadedFile):
+    """Файл, от которого обработчик отказался ещё при загрузке."""
+
+    def __init__(self, name, content_type, size, error):
+        super().__init__(None, name, content_type, size)
+        self.error = error
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку на диск и обрывает её по лимиту размера."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.rejected = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.rejected:
+            return None
+        self.received += len(raw_data)
+        if self.received > limit('MAX_UPLOAD_SIZE'):
+            # Остаток тела запроса дочитывается парсером и выбрасывается.
+            self.rejected = True
+            self.file.close()
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.rejected:
+            return RejectedUpload(
+                self.file_name,
+                self.content_type,
+                self.received,
+                'Файл слишком большой: максимум '
+                f'{format_size(limit("MAX_UPLOAD_SIZE"))}.'
+            )
+        return super().file_complete(file_size)
+
+
+def open_image(upload):
+    """Открыть картинку без чтения всего файла в память."""
+    if hasattr(upload, 'temporary_file_path'):
+        return Image.open(upload.temporary_file_path())
+    upload.seek(0)
+    return Image.open(upload)
+
+
+def check_dimensions(image):
+    """Сообщение об ошибке, если картинка больше лимита, иначе None."""
+    width, height = image.size
+    if width * height > limit('MAX_PIXELS'):
+        return (
+            f'Картинка слишком большая: {width}x{height}, максимум '
+            f'{limit("MAX_PIXELS") // 1_000_000} мегапикселей.'
+        )
+    return None
+
+
+def needs_normalizing(image):
+    if image.format not in REENCODE_FORMATS:
+        return max(image.size) > limit('MAX_SIDE')
+    return (
+        max(image.size) > limit('MAX_SIDE')
+        or image.format != REENCODE_FORMATS[image.format]
+        or 'exif' in image.info
+        or bool(image.getexif())
+    )
+
+
+def normalize(upload, image):
+    """Вернуть upload без EXIF и не больше MAX_SIDE по длинной стороне.
+
+    Если менять нечего, возвращается исходный файл.
+    """
+    if not needs_normalizing(image):
+        return upload
+    max_side = limit('MAX_SIDE')
+    format_ = REENCODE_FORMATS.get(image.format, 'PNG')
+    if image.format in ('JPEG', 'MPO'):
+        image.draft('RGB', (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image.mode == 'CMYK' or (
+        format_ == 'JPEG' and image.mode not in ('RGB', 'L')
+    ):
+        image = image.convert('RGB')
+
+    root, _ = os.path.splitext(upload.name)
+    name = root + EXTENSIONS[format_]
+    options = {'quality': JPEG_QUALITY} if format_ == 'JPEG' else {}
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    # Параметр exif не передаётся, поэтому метаданные не сохраняются.
+    # Результат сжат и ограничен MAX_SIDE, поэтому держим его в памяти.
+    buffer = BytesIO()
+    image.save(buffer, format_, **options)
+    return InMemoryUploadedFile(
+        buffer, 'image', name, Image.MIME[format_], buffer.tell(), None
+    )
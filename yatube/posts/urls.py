@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, exporting, metrics, profiling, views
 
 app_name = 'posts'
 
@@ -12,6 +12,12 @@ urlpatterns = [
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment, name='add_comment'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path('search/', views.search_posts, name='search'),
     path('follow/', views.follow_index, name='follow_index'),    
     path(
         'profile/<str:username>/follow/',
@@ -22,5 +28,37 @@ urlpatterns = [
         'profile/<str:username>/unfollow/',
         views.profile_unfollow,
         name='profile_unfollow'
-    )
+    ),
+    path('api/v1/posts/', api.index, name='api_index'),
+    path('api/v1/posts/<int:post_id>/', api.post_detail, name='api_post'),
+    path(
+        'api/v1/posts/<int:post_id>/comments/',
+        api.post_comments,
+        name='api_comments'
+    ),
+    path('api/v1/group/<slug:slug>/', api.group_posts, name='api_group'),
+    path(
+        'api/v1/profile/<str:username>/',
+        api.profile,
+        name='api_profile'
+    ),
+    path('api/v1/follow/', api.follow_index, name='api_follow'),
+    path('metrics/', metrics.export, name='metrics'),
+    path(
+        'slow-requests/',
+        profiling.snapshot_list,
+        name='slow_requests'
+    ),
+    path(
+        'slow-requests/<str:name>/',
+        profiling.snapshot_detail,
+        name='slow_request'
+    ),
+    path('export/', exporting.user_archive, name='export'),
+    path(
+        'export/<slug:kind>.<slug:format>',
+        exporting.user_file,
+        name='export_file'
+    ),
+    path('export/site/', exporting.site_archive, name='export_site'),
 ]
@@ -0,0 +1,32 @@
+from django.core.paginator import Paginator
+
+from .paginators import CursorPaginator
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 50
+
+
+def paginate(request, queryset, per_page=POSTS_PER_PAGE,
+             ordering=('-pub_date', '-id')):
+    # ?page=N — старый постраничный режим, оставлен для совместимости.
+    # По умолчанию лента листается курсором: ?cursor=<токен>.
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        paginator = Paginator(queryset.order_by(*ordering), per_page)
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(queryset, per_page, ordering=ordering)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def comments_paginator(post, per_page=None):
+    """Комментарии поста от старых к новым, курсором по (created, id).
+
+    Страница читается по индексу (post, created) вместе с авторами, так
+    что её стоимость не зависит от числа комментариев.
+    """
+    ordering = ('created', 'id')
+    return CursorPaginator(
+        post.comments.select_related('author').order_by(*ordering),
+        per_page or COMMENTS_PER_PAGE,
+        ordering=ordering
+    )
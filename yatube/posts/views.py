@@ -3,22 +3,57 @@ import datetime
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import require_safe
 
+from . import concurrency, search, thumbnails, writebuffer
+from .conditional import POSTS, author_scope, group_scope, post_scope
+from .feeds import TimelinePaginator
 from .forms import CommentForm, PostForm
 from .models import Group, Post, Follow
-from django.views.decorators.cache import cache_page
+from .pagecache import cached_page
+from .paginators import InvalidCursor
+from .utils import POSTS_PER_PAGE, comments_paginator, paginate
 
 
 User = get_user_model()
 
 
-@cache_page(20, key_prefix='index_page')
+def _index_scopes(request):
+    return [POSTS]
+
+
+def _group_scopes(request, slug):
+    return [group_scope(slug)]
+
+
+def _profile_scopes(request, username):
+    return [author_scope(username)]
+
+
+def _post_scopes(request, post_id):
+    # На странице поста выводятся и счётчики автора.
+    username = Post.objects.filter(id=post_id).values_list(
+        'author__username', flat=True
+    ).first()
+    return username and [post_scope(post_id), author_scope(username)]
+
+
+def _read_page(request, queryset):
+    page_obj = paginate(request, queryset)
+    # Страница ?page=N читает посты лениво, а в пуле concurrency.gather
+    # их надо прочитать сразу.
+    len(page_obj)
+    return page_obj
+
+
+@cached_page(_index_scopes)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj = paginate(request, post_list)
     title = 'Это главная страница проекта Yatube'
     context = {
         'page_obj': page_obj,
@@ -27,13 +62,17 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@cached_page(_group_scopes)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    # Группа и страница постов не зависят друг от друга и читаются
+    # одновременно.
+    group, page_obj = concurrency.gather(
+        lambda: get_object_or_404(Group, slug=slug),
+        lambda: _read_page(
+            request, Post.objects.for_feed().filter(group__slug=slug)
+        )
+    )
     title = 'Здесь будет информация о группах проекта Yatube'
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -42,17 +81,21 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cached_page(_profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    user = request.user if request.user.is_authenticated else None
+    author, page_obj, following = concurrency.gather(
+        lambda: get_object_or_404(
+            User.objects.select_related('stats'), username=username
+        ),
+        lambda: _read_page(
+            request, Post.objects.for_feed().filter(author__username=username)
+        ),
+        lambda: user is not None and Follow.objects.filter(
+            user=user, author__username=username
+        ).exists()
+    )
     title = f"Профайл пользователя {author}"
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following=False
-    if request.user.is_authenticated:
-        if Follow.objects.filter(user=request.user, author=author).exists():
-            following=True
     context = {
         'title': title,
         'page_obj': page_obj,
@@ -62,16 +105,47 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@cached_page(_post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.for_detail(), id=post_id)
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    # Первая страница комментариев читается лениво: при попадании в
+    # кеш фрагмента шаблон её не запрашивает. Остальные подгружает
+    # post_comments.
+    comments_page = SimpleLazyObject(comments_paginator(post).page)
     context = {'post': post,
-               'comments':comments,
+               'comments_page': comments_page,
                'form':form}
     return render(request, 'posts/post_detail.html', context)
 
 
+@require_safe
+def post_comments(request, post_id):
+    post = get_object_or_404(Post, id=post_id)
+    try:
+        page_obj = comments_paginator(post).page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Некорректный курсор.')
+    return render(request, 'posts/includes/comment_list.html', {
+        'post': post,
+        'page_obj': page_obj,
+    })
+
+
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = Paginator(search.SearchResults(query), POSTS_PER_PAGE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'title': 'Поиск по записям'
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     if request.method == 'POST':
@@ -82,9 +156,13 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.pub_date = datetime.datetime
-            post.save()
+            with transaction.atomic():
+                post.save()
+                if post.image:
+                    thumbnails.schedule_variants(post.image.name)
             return redirect('posts:profile', request.user.username)
-    form = PostForm()
+    else:
+        form = PostForm()
     return render(request, 'posts/create_post.html', {'form': form})
 
 
@@ -100,30 +178,43 @@ def post_edit(request, post_id):
             instance=post
         )
         if form.is_valid():
-            form.save()
+            post = form.save()
+            if 'image' in form.changed_data and post.image:
+                thumbnails.schedule_variants(post.image.name)
             return redirect('posts:post_detail', post.id)
-    form = PostForm(instance=post)
+    else:
+        form = PostForm(instance=post)
     return render(request, 'posts/create_post.html', {'form': form,
                                                       'post': post,
                                                       'is_edit': True})
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
+    if writebuffer.enabled():
+        # Пост проверит писатель: комментарий к удалённому не запишется.
+        if form.is_valid():
+            writebuffer.submit_comment(
+                request.user, post_id, form.cleaned_data['text']
+            )
+        return redirect('posts:post_detail', post_id=post_id)
+    post = get_object_or_404(Post, id=post_id)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+        writebuffer.save_comment(
+            request.user.id, post.id, form.cleaned_data['text']
+        )
     return redirect('posts:post_detail', post_id=post_id)
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if request.GET.get('page') is not None:
+        post_list = Post.objects.for_feed().filter(
+            author__following__user=request.user
+        )
+        page_obj = paginate(request, post_list)
+    else:
+        paginator = TimelinePaginator(request.user, POSTS_PER_PAGE)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
     context = {
         'page_obj': page_obj,
     }
@@ -133,16 +224,17 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.create(
-            user=request.user,
-            author=author
-        )
+        if writebuffer.enabled():
+            writebuffer.submit_follow(request.user, author)
+        else:
+            writebuffer.save_follow(request.user.id, author.id)
     return redirect('posts:follow_index')
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(
-        user=request.user,
-        author=author).delete()
+    if writebuffer.enabled():
+        writebuffer.submit_follow(request.user, author, following=False)
+    else:
+        writebuffer.delete_follow(request.user.id, author.id)
     return redirect('posts:follow_index')
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""Буферизованная запись комментариев и подписок.
+
+При всплеске комментариев каждый запрос делает свою короткую
+транзакцию, и единственный писатель SQLite становится узким местом:
+почти всё время уходит на блокировку и fsync фиксации, а не на сами
+INSERT. С буфером view только ставит операцию в очередь, а фоновый
+писатель собирает до BATCH_SIZE операций (или сколько придёт за
+BATCH_WAIT) и записывает их одной транзакцией: комментарии — одним
+bulk_create, счётчики — одним UPDATE на пост.
+
+Чтобы автор сразу видел свой комментарий или подписку, операция до
+записи лежит в кеше в «ожидающих» пользователя (pending_comments,
+pending_following), пока писатель не отметит её записанной.
+
+Режим задаётся настройкой POSTS_WRITE_BUFFER: 'off' — запись прямо в
+view, 'thread' — фоновый поток процесса, 'manual' — операции копятся
+до явного flush() (для тестов). Операция, принятая в буфер, теряется,
+если процесс упадёт до записи; при штатной остановке очередь
+дописывается.
+"""
+import atexit
+import itertools
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from . import caching, conditional, counters
+from .models import Comment, Follow, Post
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+# Сколько ждать остальные операции пачки после первой, в секундах.
+BATCH_WAIT = 0.05
+# Сколько хранить ожидающие операции пользователя, если писатель
+# так их и не записал.
+PENDING_TIMEOUT = 60
+
+_queue = queue.Queue()
+_writer = None
+_lock = threading.Lock()
+_submit_lock = threading.Lock()
+# Операции нумеруются в пределах процесса. После пачки писатель
+# отмечает в кеше номер последней записанной, и читатели пропускают
+# ожидающие операции с меньшим номером.
+_process = uuid.uuid4().hex
+_sequence = itertools.count(1)
+
+
+def buffer_mode():
+    return getattr(settings, 'POSTS_WRITE_BUFFER', 'off')
+
+
+def enabled():
+    return buffer_mode() != 'off'
+
+
+def save_comment(user_id, post_id, text):
+    # Счётчики меняют сигналы post_save и post_delete (posts.signals).
+    Comment.objects.create(post_id=post_id, author_id=user_id, text=text)
+
+
+def save_follow(user_id, author_id):
+    Follow.objects.get_or_create(user_id=user_id, author_id=author_id)
+
+
+def delete_follow(user_id, author_id):
+    Follow.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def submit_comment(user, post_id, text):
+    _submit(user, {
+        'kind': 'comment',
+        'post_id': post_id,
+        'text': text,
+    })
+
+
+def submit_follow(user, author, following=True):
+    _submit(user, {
+        'kind': 'follow',
+        'author_id': author.id,
+        'author_username': author.username,
+        'following': following,
+    })
+
+
+def _submit(user, operation):
+    with _submit_lock:
+        # Номера идут в очередь по порядку, поэтому каждая пачка
+        # писателя — непрерывный отрезок номеров.
+        operation.update(
+            process=_process, seq=next(_sequence), user_id=user.id
+        )
+        _queue.put(operation)
+    # Если писатель успеет раньше, операция сразу окажется записанной.
+    _remember(operation)
+    if buffer_mode() == 'thread':
+        _start_writer()
+
+
+def _start_writer():
+    global _writer
+    with _lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(
+                target=_run_writer, name='write-buffer', daemon=True
+            )
+            _writer.start()
+            atexit.register(flush)
+
+
+def _next_batch():
+    batch = [_queue.get()]
+    deadline = time.monotonic() + BATCH_WAIT
+    while len(batch) < BATCH_SIZE:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=timeout))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _run_writer():
+    while True:
+        batch = _next_batch()
+        try:
+            write(batch)
+        finally:
+            for _ in batch:
+                _queue.task_done()
+            if _queue.empty():
+                # Под нагрузкой соединение переиспользуется, в простое
+                # закрывается.
+                connections.close_all()
+
+
+def flush():
+    """Дождаться записи всего, что уже стоит в очереди.
+
+    Без фонового писателя (режим 'manual') пишет сам, пачками.
+    """
+    if _writer is not None and _writer.is_alive():
+        _queue.join()
+        return
+    while True:
+        batch = []
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+        try:
+            write(batch)
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+
+def write(batch):
+    """Записать пачку операций одной транзакцией.
+
+    Если пачка не записалась, операции пишутся по одной, чтобы одна
+    плохая не потянула за собой остальные.
+    """
+    try:
+        try:
+            with transaction.atomic():
+                _apply(batch)
+        except Exception:
+            logger.exception('Не удалось записать пачку из %s', len(batch))
+            for operation in batch:
+                try:
+                    with transaction.atomic():
+                        _apply([operation])
+                except Exception:
+                    logger.exception('Не удалось записать %s', operation)
+    finally:
+        _mark_written(batch)
+
+
+def _apply(batch):
+    comments = [op for op in batch if op['kind'] == 'comment']
+    if comments:
+        _write_comments(comments)
+    # Из нескольких подписок и отписок на одного автора важна последняя.
+    follows = {}
+    for op in batch:
+        if op['kind'] == 'follow':
+            follows[op['user_id'], op['author_id']] = op['following']
+    for (user_id, author_id), following in follows.items():
+        if following:
+            save_follow(user_id, author_id)
+        else:
+            delete_follow(user_id, author_id)
+
+
+def _write_comments(operations):
+    # Пост могли удалить, пока комментарий ждал в очереди.
+    existing = set(Post.objects.filter(
+        id__in={op['post_id'] for op in operations}
+    ).values_list('id', flat=True))
+    comments = [
+        Comment(
+            post_id=op['post_id'], author_id=op['user_id'], text=op['text']
+        )
+        for op in operations if op['post_id'] in existing
+    ]
+    # bulk_create идёт мимо сигналов: счётчики и кеш обновляем сами,
+    # по одному разу на пост.
+    Comment.objects.bulk_create(comments)
+    totals = Counter(comment.post_id for comment in comments)
+    counters.comments_added(totals)
+    caching.invalidate_comments(totals)
+    conditional.touch(
+        *[conditional.post_scope(post_id) for post_id in totals]
+    )
+
+
+def _pending_key(user_id):
+    return caching.make_key('pending', user_id)
+
+
+def _written_key(process):
+    return caching.make_key('pending', 'written', process)
+
+
+def _remember(operation):
+    # Без блокировки: один пользователь редко пишет из двух запросов
+    # сразу, а потеря записи в списке видна только ему и ненадолго.
+    key = _pending_key(operation['user_id'])
+    pending = _unwritten(cache.get(key) or [])
+    pending.append(operation)
+    cache.set(key, pending, PENDING_TIMEOUT)
+
+
+def _mark_written(batch):
+    cache.set(
+        _written_key(_process), max(op['seq'] for op in batch),
+        PENDING_TIMEOUT
+    )
+
+
+def _unwritten(operations):
+    processes = {op['process'] for op in operations}
+    keys = {process: _written_key(process) for process in processes}
+    written = cache.get_many(keys.values())
+    return [
+        op for op in operations
+        if op['seq'] > written.get(keys[op['process']], 0)
+    ]
+
+
+def pending(user):
+    """Операции пользователя, ещё не записанные в базу."""
+    if not enabled() or not user.is_authenticated:
+        return []
+    return _unwritten(cache.get(_pending_key(user.id)) or [])
+
+
+def pending_comments(user, post_id):
+    return [
+        op for op in pending(user)
+        if op['kind'] == 'comment' and op['post_id'] == post_id
+    ]
+
+
+def pending_following(user, author_username):
+    """Подписан ли пользователь с учётом очереди; None — операций нет."""
+    following = None
+    for op in pending(user):
+        if op['kind'] == 'follow' and (
+            op['author_username'] == author_username
+        ):
+            following = op['following']
+    return following
@@ -0,0 +1,38 @@
+"""Настройки yatube по профилям.
+
+Профиль выбирается переменной окружения SETTINGS_PROFILE:
+- dev (по умолчанию) — разработка: DEBUG, шаблоны без кеша, письма
+  в файлы;
+- test — dev для тестов, его выбирает manage.py test, а pytest
+  подключает модуль yatube.settings.test напрямую (pytest.ini): кеш в
+  памяти и быстрый хешер паролей;
+- prod — продакшен: без DEBUG, ключ и хосты только из окружения,
+  постоянные соединения с базой, сессии в кеше, статика с хешами в
+  именах (нужен collectstatic);
+- bench — замеры производительности: то же, что prod, но с
+  фиксированными значениями, чтобы замеры разных машин и запусков
+  были сравнимы.
+
+Общее — в base, профиль переопределяет только отличия.
+"""
+import os
+from importlib import import_module
+
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILES = ('dev', 'test', 'prod', 'bench')
+
+SETTINGS_PROFILE = os.environ.get('SETTINGS_PROFILE', 'dev')
+if SETTINGS_PROFILE not in PROFILES:
+    raise ImproperlyConfigured(
+        f'Неизвестный профиль настроек {SETTINGS_PROFILE!r}, '
+        f'допустимы: {", ".join(PROFILES)}.'
+    )
+
+globals().update(
+    (name, value)
+    for name, value in vars(
+        import_module(f'{__name__}.{SETTINGS_PROFILE}')
+    ).items()
+    if name.isupper()
+)
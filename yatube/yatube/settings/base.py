@@ -0,0 +1,289 @@
+"""
+Django settings for yatube project: общие для всех профилей.
+
+Generated by 'django-admin startproject' using Django 2.2.19.
+
+Здесь значения для работающего сайта: без DEBUG, с кешированными
+шаблонами. Профили из yatube.settings переопределяют только отличия.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/2.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/2.2/ref/settings/
+"""
+
+import os
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+def env_flag(name, default):
+    """Флаг из окружения: '1' — включён, '0' — выключен."""
+    return os.environ.get(name, '1' if default else '0') == '1'
+
+
+def env_list(name, default=()):
+    value = os.environ.get(name)
+    return value.split(',') if value else list(default)
+
+
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+# Ключ задаёт профиль: prod берёт его только из окружения.
+SECRET_KEY = os.environ.get('SECRET_KEY', '')
+
+DEBUG = False
+
+ALLOWED_HOSTS = env_list('ALLOWED_HOSTS')
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'posts.apps.PostsConfig',
+    'users.apps.UsersConfig',
+    'core.apps.CoreConfig',
+    'about.apps.AboutConfig',
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'sorl.thumbnail'
+]
+
+MIDDLEWARE = [
+    'posts.middleware.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.middleware.SlowRequestMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+
+
+def template_settings(cached):
+    loaders = [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]
+    if cached:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    return [
+        {
+            'BACKEND': 'posts.metrics.DjangoTemplates',
+            'DIRS': [TEMPLATES_DIR],
+            'OPTIONS': {
+                'loaders': loaders,
+                'context_processors': [
+                    'django.template.context_processors.debug',
+                    'django.template.context_processors.request',
+                    'django.contrib.auth.context_processors.auth',
+                    'django.contrib.messages.context_processors.messages',
+                    'core.context_processors.year.year',
+                ],
+            },
+        },
+    ]
+
+
+# Кешированный загрузчик: шаблон разбирается один раз на процесс, а не
+# на каждый рендер (posts.templating). Профиль dev его выключает, чтобы
+# правки шаблонов были видны без перезапуска.
+POSTS_TEMPLATE_CACHE = env_flag('TEMPLATE_CACHE', True)
+TEMPLATES = template_settings(POSTS_TEMPLATE_CACHE)
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+# По умолчанию SQLite в файле (posts.backends.sqlite3: транзакции с
+# BEGIN IMMEDIATE); для PostgreSQL или MySQL задайте DB_ENGINE,
+# DB_NAME, DB_USER, DB_PASSWORD, DB_HOST и DB_PORT.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'posts.backends.sqlite3')
+DATABASES = {
+    'default': {
+        'ENGINE': DB_ENGINE,
+        'NAME': os.environ.get(
+            'DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        # Сколько секунд держать соединение между запросами; у SQLite
+        # открыть файл дёшево, а серверу каждое соединение стоит процесса.
+        'CONN_MAX_AGE': int(os.environ.get(
+            'DB_CONN_MAX_AGE', 0 if DB_ENGINE.endswith('sqlite3') else 60
+        )),
+        # За пулером соединений (pgbouncer в режиме transaction)
+        # серверные курсоры .iterator() не переживают конец транзакции.
+        'DISABLE_SERVER_SIDE_CURSORS': (
+            os.environ.get('DB_POOLER', '') == 'transaction'
+        ),
+    }
+}
+
+# Комментарии и подписки через буфер записи (posts.writebuffer):
+# off — запись в запросе, thread — пачками в фоновом потоке.
+POSTS_WRITE_BUFFER = os.environ.get('WRITE_BUFFER', 'off')
+
+
+def query_threads(database):
+    # Без постоянных соединений задача пула открывает и закрывает своё
+    # соединение (у SQLite ещё и с прагмами) дольше, чем идёт запрос,
+    # так что SQLite с CONN_MAX_AGE=0 по умолчанию обходится без пула.
+    sqlite = database['ENGINE'].endswith('sqlite3')
+    default = 0 if sqlite and not database['CONN_MAX_AGE'] else 4
+    return int(os.environ.get('QUERY_THREADS', default))
+
+
+# Потоки для одновременных независимых запросов view
+# (posts.concurrency); 0 — запросы по очереди в потоке запроса.
+POSTS_QUERY_THREADS = query_threads(DATABASES['default'])
+
+# Прагмы для каждого соединения с SQLite (posts.database).
+POSTS_SQLITE_PRAGMAS = {
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'normal'),
+    'mmap_size': int(
+        os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+    ),
+}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
+STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
+STATIC_ROOT = os.environ.get(
+    'STATIC_ROOT', os.path.join(BASE_DIR, 'static_root')
+)
+
+LOGIN_URL = 'users:login'
+LOGIN_REDIRECT_URL = 'posts:index'
+
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Общий для всех воркеров кеш. Единственный пересчёт значений
+# (posts.caching) держится на атомарном cache.add(): файловый бэкенд
+# posts.backends.filecache даёт его в пределах одного хоста и работает
+# без дополнительных сервисов; для нескольких хостов задайте
+# CACHE_BACKEND и CACHE_LOCATION для memcached или redis.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'posts.backends.filecache.FileBasedCache'
+        ),
+        'LOCATION': os.environ.get(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+        'KEY_PREFIX': 'yatube',
+        'VERSION': int(os.environ.get('CACHE_VERSION', 1)),
+        'OPTIONS': {
+            # Файловый бэкенд при очистке перечисляет весь каталог.
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+        },
+    }
+}
+
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+# thread — миниатюры создаются в фоновом пуле, immediate — при рендеринге.
+POSTS_THUMBNAIL_QUEUE = os.environ.get('THUMBNAIL_QUEUE', 'thread')
+
+# Загрузки пишутся на диск кусками и обрываются по лимиту размера.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.ImageUploadHandler']
+POSTS_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get('IMAGE_MAX_UPLOAD_SIZE', 20 * 1024 * 1024)
+)
+POSTS_IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', 50_000_000))
+POSTS_IMAGE_MAX_SIDE = int(os.environ.get('IMAGE_MAX_SIDE', 2560))
+
+# Доля запросов, для которых собираются метрики (posts.metrics);
+# 0 — middleware метрик выключен.
+POSTS_METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 0))
+# Токен сборщика Prometheus для /metrics/ (заголовок Authorization:
+# Bearer <токен>); пустой — страница доступна только персоналу.
+POSTS_METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Снимки медленных запросов (posts.profiling): какие view отслеживать
+# и с какого времени ответа, в секундах, сохранять снимок.
+POSTS_SLOW_REQUEST_VIEWS = ['posts:post_detail', 'posts:follow_index']
+POSTS_SLOW_REQUEST_THRESHOLD = float(
+    os.environ.get('SLOW_REQUEST_THRESHOLD', 0.5)
+)
+POSTS_SLOW_REQUEST_DIR = os.environ.get(
+    'SLOW_REQUEST_DIR', os.path.join(BASE_DIR, 'slow_requests')
+)
+POSTS_SLOW_REQUEST_KEEP = 100
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'posts.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
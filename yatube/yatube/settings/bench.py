@@ -0,0 +1,61 @@
+"""Профиль bench: замеры производительности.
+
+Те же решения, что в prod, но значения зафиксированы и не берутся из
+окружения: замер не должен зависеть от переменных в оболочке того,
+кто его запускает. Из окружения берётся только база (DB_*), чтобы
+сравнивать движки.
+"""
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import BASE_DIR, DATABASES, template_settings
+
+DEBUG = False
+# Фиксированный ключ: подписанные курсоры и cookie одинаковы между
+# запусками. Только для замеров.
+SECRET_KEY = 'bench-only-not-secret'
+ALLOWED_HOSTS = ['localhost', '127.0.0.1', '[::1]', 'testserver']
+
+POSTS_TEMPLATE_CACHE = True
+TEMPLATES = template_settings(POSTS_TEMPLATE_CACHE)
+
+DATABASES = {
+    'default': dict(DATABASES['default'], CONN_MAX_AGE=600),
+}
+POSTS_SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'posts.backends.filecache.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'bench'),
+        'KEY_PREFIX': 'yatube',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+# Манифест статики требует collectstatic перед каждым замером, а
+# статику замеры не запрашивают.
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+STATIC_ROOT = os.path.join(BASE_DIR, 'static_root')
+
+POSTS_WRITE_BUFFER = 'off'
+POSTS_QUERY_THREADS = 4
+POSTS_THUMBNAIL_QUEUE = 'thread'
+POSTS_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POSTS_IMAGE_MAX_PIXELS = 50_000_000
+POSTS_IMAGE_MAX_SIDE = 2560
+# Замеры не должны платить за свои же метрики и снимки.
+POSTS_METRICS_SAMPLE_RATE = 0
+POSTS_METRICS_TOKEN = ''
+POSTS_SLOW_REQUEST_VIEWS = []
+POSTS_SLOW_REQUEST_THRESHOLD = 0.5
+POSTS_SLOW_REQUEST_DIR = os.path.join(BASE_DIR, 'slow_requests')
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
@@ -0,0 +1,21 @@
+"""Профиль dev: локальная разработка."""
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import env_flag, env_list, template_settings
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = env_flag('DEBUG', True)
+
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY', 'po1ubeh%csb&9rg8bh8o^32vb!4ll&@=13euts4uly$c@av^35'
+)
+
+ALLOWED_HOSTS = env_list('ALLOWED_HOSTS', [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver'])
+
+POSTS_TEMPLATE_CACHE = env_flag('TEMPLATE_CACHE', False)
+TEMPLATES = template_settings(POSTS_TEMPLATE_CACHE)
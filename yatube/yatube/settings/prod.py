@@ -0,0 +1,40 @@
+"""Профиль prod: продакшен."""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import ALLOWED_HOSTS, DATABASES, SECRET_KEY, query_threads
+
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Профилю prod нужен SECRET_KEY в окружении.')
+if not ALLOWED_HOSTS:
+    raise ImproperlyConfigured(
+        'Профилю prod нужен ALLOWED_HOSTS в окружении (через запятую).'
+    )
+
+# Соединение с базой переживает запрос: не платим за подключение и,
+# у SQLite, за прагмы POSTS_SQLITE_PRAGMAS на каждом запросе.
+DATABASES = {
+    'default': dict(
+        DATABASES['default'],
+        CONN_MAX_AGE=int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+    ),
+}
+POSTS_QUERY_THREADS = query_threads(DATABASES['default'])
+
+# Сессия читается из общего кеша, а база нужна только при записи.
+SESSION_ENGINE = os.environ.get(
+    'SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db'
+)
+
+# Хеш содержимого в имени файла: статику можно кешировать навсегда.
+STATICFILES_STORAGE = (
+    'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+)
+
+EMAIL_BACKEND = os.environ.get(
+    'EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend'
+)
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
@@ -0,0 +1,16 @@
+"""Профиль test: dev для тестов."""
+from .dev import *  # noqa: F401,F403
+
+# Тесты не делят кеш с запущенным сайтом и между прогонами.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'KEY_PREFIX': 'yatube',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    }
+}
+
+# Надёжный хешер в тестах только замедляет create_user и логин.
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
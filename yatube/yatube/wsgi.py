@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# С кешированным загрузчиком шаблоны разбираются при старте воркера,
+# а не первыми запросами к страницам.
+from posts import templating  # noqa: E402
+
+templating.warm_up()